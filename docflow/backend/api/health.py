@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 18:05:12.
+
+@author: ppolxda
+
+@desc: 模型预热和健康检查
+"""
+
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from ..google_ocr import api as ocr_api
+from ..predict_engine import warmup_predictor
+from ..predict_utils import close_clients
+
+LOGGER = logging.getLogger()
+
+
+def register_health(app: FastAPI, *predictors):
+    """注册启动预热、关闭连接事件和健康检查接口.
+
+    uvicorn 在 startup 事件完成后才监听端口, 预热放到后台任务执行,
+    服务启动后依次预热 predictors, 预热完成前或预热失败时 /health 返回503;
+    服务关闭时释放OCR、下载和S3长连接
+    """
+    app.state.ready = False
+    app.state.warmup_failed = False
+    app.state.warmup_task = None
+
+    async def warmup():
+        """预热模型."""
+        loop = asyncio.get_running_loop()
+        for predictor in predictors:
+            if not await loop.run_in_executor(None, warmup_predictor, predictor):
+                app.state.warmup_failed = True
+                LOGGER.error("service warmup failed")
+                return
+
+        app.state.ready = True
+        LOGGER.info("service ready")
+
+    @app.on_event("startup")
+    async def start_warmup():
+        """启动后台预热任务."""
+        app.state.warmup_task = asyncio.create_task(warmup())
+
+    @app.on_event("shutdown")
+    async def close():
+        """关闭长连接会话."""
+        await ocr_api.close()
+        await close_clients()
+
+    @app.get("/health")
+    async def health():
+        """健康检查."""
+        if not app.state.ready:
+            status = "failed" if app.state.warmup_failed else "warming"
+            return JSONResponse(
+                {"status": status}, status_code=HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return {"status": "ok"}
@@ -28,6 +28,7 @@ from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 from ..predict_transformers import Layoutlmv3Predict
 from ..predict_transformers import WordSymbol
 from ..predict_utils import BaseModel
+from .health import register_health
 
 LOGGER = logging.getLogger()
 
@@ -58,6 +59,7 @@ class PredictImageResponse(PredictImageRequest):
 
 app = FastAPI()
 cli = Layoutlmv3Predict()
+register_health(app, cli)
 applications.get_swagger_ui_html = swagger_monkey_patch  # type: ignore
 
 
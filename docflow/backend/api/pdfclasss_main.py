@@ -21,6 +21,7 @@ from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 # from ..predict_transformers import Layoutlmv3ClassificationPredict
 from ..predict_transformers import Layoutlmv3ClassificationBertPredict
 from ..predict_utils import BaseModel
+from .health import register_health
 
 LOGGER = logging.getLogger()
 
@@ -41,6 +42,7 @@ class PredictImageResponse(PredictImageRequest):
 
 
 app = FastAPI()
+register_health(app, cli)
 
 
 @app.exception_handler(Exception)
@@ -25,6 +25,7 @@ from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 
 from ..predict_utils import BaseModel
 from ..predict_yolo import YoloDataProcess
+from .health import register_health
 
 LOGGER = logging.getLogger()
 
@@ -63,6 +64,7 @@ def rotate_image(image: Image.Image, rotate: float):
 
 
 app = FastAPI()
+register_health(app, cli)
 
 
 @app.exception_handler(Exception)
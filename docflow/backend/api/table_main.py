@@ -16,12 +16,14 @@ from typing import Optional
 
 import click
 import uvicorn
+from docflow.backend.api.health import register_health
 from docflow.backend.predict_table.schemas import TabelInfo
 from docflow.backend.predict_table.table_transformer import TableTransformerDetection
 from docflow.backend.predict_table.table_transformer import TableTransformerStructure
 from docflow.backend.predict_table.tables import TableStructurePredict
 from docflow.backend.predict_utils import BaseModel
 from docflow.backend.predict_utils import download_image
+from docflow.backend.predict_utils import download_image_data
 from fastapi import FastAPI
 from fastapi import Query
 from fastapi import Request
@@ -57,6 +59,7 @@ app = FastAPI()
 tts = TableTransformerStructure()
 ttd = TableTransformerDetection()
 table_predict = TableStructurePredict(ttd, tts, (5, 5, 5, 5))
+register_health(app, table_predict)
 
 
 def draw_box_without_text(image: Image.Image, tokens, fill: bool = False):
@@ -90,9 +93,9 @@ async def get_ocr_tables(
 ):
     """ocr识别内容填充单元格."""
     if req.url:
-        image = await download_image(req.url)
+        image = await download_image_data(req.url)
     elif req.base64:
-        image = await download_image(base64.b64decode(req.base64.encode()))
+        image = await download_image_data(base64.b64decode(req.base64.encode()))
     else:
         raise TypeError("无效请求")
 
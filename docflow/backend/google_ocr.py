@@ -6,23 +6,29 @@
 
 @desc: 接口签名
 """
+import asyncio
 import binascii
 import hashlib
 import json
-from io import BytesIO
+from collections import OrderedDict
 from typing import Iterable
 from typing import List
 from typing import Optional
 from typing import Union
 
-import requests
+import aiohttp
+from botocore.exceptions import ClientError
 from PIL import Image
 from pydantic import Field
 
+from docflow.utils.loops import LoopLocal
+from docflow.utils.loops import LoopSession
+
 from .predict_utils import BaseModel
+from .predict_utils import ImageData
 from .predict_utils import download_file
-from .predict_utils import image_to_bytes
 from .predict_utils import logger
+from .predict_utils import s3client
 from .settings import settings
 
 
@@ -272,8 +278,15 @@ def iter_conv_google2symbol(gocrs: OcrData) -> Iterable[WordSymbol]:
         )
 
 
+def ocr_content(image: ImageData) -> bytes:
+    """OCR上传数据, 原始PNG/JPEG数据直接使用, 其他格式重新编码为PNG."""
+    if image.is_png or image.is_jpeg:
+        return image.data
+    return image.to_png()
+
+
 async def ocr_image(
-    image: Image.Image,
+    image: Union[Image.Image, ImageData],
     ocr_uri: Optional[str] = None,
     download_timeout: Optional[int] = None,
 ) -> List[WordSymbol]:
@@ -283,8 +296,20 @@ async def ocr_image(
         if not ocrdata:
             return await ocr_image(image, "", download_timeout)
     else:
-        buffer = image_to_bytes(image)
-        ocrdata = await api.ocr_image(buffer)
+        if not isinstance(image, ImageData):
+            image = ImageData(image=image)
+
+        # 非PNG/JPEG需要重新编码, 在线程池执行避免阻塞事件循环;
+        # 哈希只计算编码数据, 不再展开像素
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(None, ocr_content, image)
+        hash_code = ocr_cache.image_hash(content)
+
+        # 相同图片优先命中缓存, 避免重复识别
+        ocrdata = await ocr_cache.get(hash_code)
+        if ocrdata is None:
+            ocrdata = await api.ocr_image(content)
+            await ocr_cache.put(hash_code, ocrdata)
 
     if not ocrdata:
         # raise TypeError("未能加载到OCR数据")
@@ -309,13 +334,147 @@ async def load_s3_cache(
         return rrr
 
 
+class OcrResultCache(object):
+    """OCR识别结果缓存.
+
+    一级缓存为进程内LRU, 二级缓存为S3 words目录(与 S3CacheClient 路径一致),
+    键值为上传图片编码数据的哈希, 读取时返回副本避免调用方修改缓存
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        use_s3: Optional[bool] = None,
+        bucket: Optional[str] = None,
+        prefix: str = "words",
+    ):
+        """初始化函数."""
+        if maxsize is None:
+            maxsize = settings.OCR_CACHE_SIZE
+
+        if use_s3 is None:
+            use_s3 = settings.OCR_CACHE_S3
+
+        if bucket is None:
+            bucket = settings.S3_BUCKET
+
+        self.maxsize = maxsize
+        self.use_s3 = use_s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache: "OrderedDict[str, List[WordSymbol]]" = OrderedDict()
+        self.hits = 0
+        self.s3_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def image_hash(data: bytes) -> str:
+        """图片编码数据哈希."""
+        return hashlib.md5(data).hexdigest()
+
+    def make_object_id(self, hash_code: str) -> str:
+        """S3缓存键值."""
+        return "/".join([self.prefix, hash_code[:2], hash_code + ".json"])
+
+    def stats(self) -> dict:
+        """缓存命中统计."""
+        return {
+            "hits": self.hits,
+            "s3_hits": self.s3_hits,
+            "misses": self.misses,
+            "size": len(self.cache),
+        }
+
+    def get_local(self, hash_code: str) -> Optional[List[WordSymbol]]:
+        """读取进程内缓存."""
+        words = self.cache.get(hash_code)
+        if words is None:
+            return None
+
+        self.cache.move_to_end(hash_code)
+        return [i.copy() for i in words]
+
+    def put_local(self, hash_code: str, words: List[WordSymbol]):
+        """写入进程内缓存."""
+        if self.maxsize <= 0:
+            return
+
+        self.cache[hash_code] = [i.copy() for i in words]
+        self.cache.move_to_end(hash_code)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    async def get(self, hash_code: str) -> Optional[List[WordSymbol]]:
+        """读取缓存, 未命中返回None."""
+        words = self.get_local(hash_code)
+        if words is not None:
+            self.hits += 1
+            return words
+
+        if self.use_s3:
+            words = await self.get_s3(hash_code)
+            if words is not None:
+                self.s3_hits += 1
+                self.put_local(hash_code, words)
+                return words
+
+        self.misses += 1
+        return None
+
+    async def put(self, hash_code: str, words: List[WordSymbol]):
+        """写入缓存."""
+        self.put_local(hash_code, words)
+        if self.use_s3:
+            await self.put_s3(hash_code, words)
+
+    async def get_s3(self, hash_code: str) -> Optional[List[WordSymbol]]:
+        """读取S3缓存."""
+        try:
+            async with s3client.client() as s3cli:
+                rrr = await s3cli.get_object(
+                    Bucket=self.bucket, Key=self.make_object_id(hash_code)
+                )
+                data = json.loads(await rrr["Body"].read())
+        except ClientError as ex:
+            assert isinstance(ex.response, dict)
+            if ex.response.get("Error", {}).get("Code", "") not in [
+                "404",
+                "NoSuchKey",
+            ]:
+                logger.warning("读取OCR缓存失败[%s]%s", ex, hash_code)
+            return None
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning("读取OCR缓存失败[%s]%s", ex, hash_code)
+            return None
+        return [WordSymbol(**i) for i in data["words"]]
+
+    async def put_s3(self, hash_code: str, words: List[WordSymbol]):
+        """写入S3缓存, 失败不影响识别结果."""
+        data = json.dumps({"words": [i.dict() for i in words]}).encode()
+        try:
+            async with s3client.client() as s3cli:
+                await s3cli.put_object(
+                    Bucket=self.bucket,
+                    Key=self.make_object_id(hash_code),
+                    Body=data,
+                    ContentType="application/json",
+                )
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning("写入OCR缓存失败[%s]%s", ex, hash_code)
+
+
 class GoogleOcrApi(object):
-    """GoogleOcrApi."""
+    """GoogleOcrApi.
+
+    使用长连接 aiohttp 会话, 连接池与并发数由 concurrency 限制,
+    会话与信号量按事件循环各自持有
+    """
 
     def __init__(
         self,
         api_host: Optional[str] = None,
         default_timeout: Optional[int] = None,
+        concurrency: Optional[int] = None,
     ):
         """初始化函数."""
         # 相互引用问题,采取懒加载
@@ -325,8 +484,32 @@ class GoogleOcrApi(object):
         if default_timeout is None:
             default_timeout = settings.GOOGLE_API_TIMEOUT
 
+        if concurrency is None:
+            concurrency = settings.GOOGLE_API_CONCURRENCY
+
         self.api_host = api_host
         self.default_timeout = default_timeout
+        self.concurrency = concurrency
+        self.sessions = LoopSession(self.create_session)
+        self.semaphores = LoopLocal(self.create_semaphore)
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """创建长连接会话."""
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency)
+        )
+
+    def create_semaphore(self) -> asyncio.Semaphore:
+        """创建并发限制."""
+        return asyncio.Semaphore(self.concurrency)
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的长连接会话."""
+        return self.sessions.get()
+
+    async def close(self):
+        """关闭当前事件循环的会话."""
+        await self.sessions.close()
 
     async def ocr_image(
         self, image: Union[bytes, str], timeout: Optional[int] = None
@@ -353,27 +536,28 @@ class GoogleOcrApi(object):
         else:
             image_data = image
 
+        form = aiohttp.FormData()
+        form.add_field("files", image_data, filename="files")
+        form.add_field("sign", sign_image(image_data))
+
         url = self.api_host + "/ocr"
-        rrr = requests.post(
-            url,
-            files={
-                "files": BytesIO(image_data),
-            },
-            data={
-                "sign": sign_image(image_data),
-            },
-            timeout=timeout,
-        )
-        logger.debug(
-            "google ocr[%s][%s]",
-            rrr.status_code,
-            image if not isinstance(image, bytes) else "",
-        )
-        if rrr.status_code != 200:
-            raise TypeError(f"[{self.api_host}]请求识别失败[{rrr.status_code}]")
+        session = self.get_session()
+        async with self.semaphores.get():
+            async with session.post(
+                url, data=form, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as rrr:
+                logger.debug(
+                    "google ocr[%s][%s]",
+                    rrr.status,
+                    image if not isinstance(image, bytes) else "",
+                )
+                if rrr.status != 200:
+                    raise TypeError(f"[{self.api_host}]请求识别失败[{rrr.status}]")
+
+                data = await rrr.json(content_type=None)
 
-        data = rrr.json()
         return OcrData(**data)
 
 
 api = GoogleOcrApi()
+ocr_cache = OcrResultCache()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 09:12:40.
+
+@author: ppolxda
+
+@desc: 跨请求动态批处理
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import torch
+
+from docflow.utils.loops import LoopLocal
+
+LOGGER = logging.getLogger()
+
+Inputs = Dict[str, torch.Tensor]
+
+
+@dataclass
+class BatchItem(object):
+    """待推理请求."""
+
+    inputs: Inputs
+    future: asyncio.Future
+
+    @property
+    def size(self) -> int:
+        """请求窗口数量(含overflow窗口)."""
+        return int(next(iter(self.inputs.values())).shape[0])
+
+
+@dataclass
+class BatchQueue(object):
+    """事件循环内的请求队列和调度协程."""
+
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+    worker: Optional[asyncio.Task] = None
+    pending: Optional[BatchItem] = None
+
+
+class DynamicBatcher(object):
+    """动态批处理调度器.
+
+    在 max_wait 秒内收集并发请求，按第0维拼接为一个批次，
+    只执行一次前向推理后再把 logits 按请求拆分回各自的 future。
+
+    forward: 同步推理函数，输入拼接后的张量，返回 [N, ...] 的 logits
+    max_batch_size: 单批次最大窗口数(单个请求窗口数超出时独占一个批次)
+    max_wait: 最大等待时长(秒)
+    executor: 执行 forward 的线程池，默认事件循环的默认线程池
+
+    每个事件循环各自持有请求队列和调度协程，切换事件循环不影响已入队的请求
+    """
+
+    def __init__(
+        self,
+        forward: Callable[[Inputs], torch.Tensor],
+        max_batch_size: int = 8,
+        max_wait: float = 0.005,
+        executor: Optional[Executor] = None,
+    ):
+        """初始化函数."""
+        if max_batch_size < 1:
+            raise TypeError("max_batch_size invaild")
+
+        self.forward = forward
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queues: LoopLocal[BatchQueue] = LoopLocal(BatchQueue)
+
+    def __getstate__(self):
+        """序列化时不包含事件循环相关状态."""
+        state = self.__dict__.copy()
+        state.update(queues=None)
+        return state
+
+    def __setstate__(self, state):
+        """反序列化后重新创建事件循环相关状态."""
+        self.__dict__.update(state)
+        self.queues = LoopLocal(BatchQueue)
+
+    def start(self) -> BatchQueue:
+        """获取当前事件循环的请求队列，调度协程未运行时启动."""
+        batch_queue = self.queues.get()
+        if batch_queue.worker is None or batch_queue.worker.done():
+            loop = asyncio.get_running_loop()
+            batch_queue.worker = loop.create_task(self._run(batch_queue))
+        return batch_queue
+
+    async def predict(self, inputs: Inputs) -> torch.Tensor:
+        """提交请求，等待批次推理结果."""
+        batch_queue = self.start()
+        loop = asyncio.get_running_loop()
+        item = BatchItem(inputs=inputs, future=loop.create_future())
+        await batch_queue.queue.put(item)
+        return await item.future
+
+    async def close(self):
+        """停止当前事件循环的调度协程，取消未完成的请求."""
+        batch_queue = self.queues.pop()
+        if batch_queue is None:
+            return
+
+        if batch_queue.worker is not None:
+            batch_queue.worker.cancel()
+            await asyncio.gather(batch_queue.worker, return_exceptions=True)
+
+        items = [] if batch_queue.pending is None else [batch_queue.pending]
+        while not batch_queue.queue.empty():
+            items.append(batch_queue.queue.get_nowait())
+        for item in items:
+            item.future.cancel()
+
+    async def _next_item(
+        self, batch_queue: BatchQueue, timeout: Optional[float] = None
+    ) -> BatchItem:
+        """获取下一个请求."""
+        if batch_queue.pending is not None:
+            item, batch_queue.pending = batch_queue.pending, None
+            return item
+
+        if timeout is None:
+            return await batch_queue.queue.get()
+        return await asyncio.wait_for(batch_queue.queue.get(), timeout)
+
+    async def _collect(self, batch_queue: BatchQueue, batch: List[BatchItem]):
+        """收集一个批次到 batch，调度协程被取消时调用方可取消已收集的请求."""
+        loop = asyncio.get_running_loop()
+        batch.append(await self._next_item(batch_queue))
+        size = batch[0].size
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+
+            try:
+                item = await self._next_item(batch_queue, timeout)
+            except asyncio.TimeoutError:
+                break
+
+            # 超出批次大小，留到下一批次
+            if size + item.size > self.max_batch_size:
+                batch_queue.pending = item
+                break
+
+            batch.append(item)
+            size += item.size
+
+    async def _run(self, batch_queue: BatchQueue):
+        """调度主循环."""
+        while True:
+            batch: List[BatchItem] = []
+            try:
+                await self._collect(batch_queue, batch)
+                batch = [i for i in batch if not i.future.done()]
+                if not batch:
+                    continue
+
+                await self._run_batch(batch)
+            except asyncio.CancelledError:
+                for item in batch:
+                    item.future.cancel()
+                raise
+            except Exception as ex:  # pylint: disable=broad-except
+                LOGGER.warning("批处理推理失败[%s]", ex)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(ex)
+
+    async def _run_batch(self, batch: List[BatchItem]):
+        """执行批次推理并拆分结果."""
+        loop = asyncio.get_running_loop()
+        inputs = {
+            key: torch.cat([i.inputs[key] for i in batch])
+            for key in batch[0].inputs.keys()
+        }
+        logits = await loop.run_in_executor(self.executor, self.forward, inputs)
+
+        offset = 0
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(logits[offset : offset + item.size])
+            offset += item.size
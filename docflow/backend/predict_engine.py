@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 10:03:25.
+
+@author: ppolxda
+
+@desc: 推理后端
+"""
+
+import asyncio
+import contextlib
+import inspect
+import logging
+import os
+import threading
+import time
+import types
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Set
+from typing import TypeVar
+
+import torch
+from transformers import AutoConfig
+
+from .settings import settings
+
+LOGGER = logging.getLogger()
+ONNX_OPSET = 14
+ONNX_SEQ_LEN = 512  # 处理器固定 padding 到 max_length=512
+# LayoutLMv3 直接读取这些Linear层的 weight 作为相对位置偏置表, 量化后无法读取
+QUANTIZE_SKIP_MODULES = ("rel_pos_bias", "rel_pos_x_bias", "rel_pos_y_bias")
+T = TypeVar("T")
+
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")  # type: ignore # pylint: disable=no-member
+
+
+@dataclass
+class OnnxOutput(object):
+    """onnx推理结果, 与transformers输出保持一致."""
+
+    logits: torch.Tensor
+
+
+def example_inputs(model) -> Dict[str, torch.Tensor]:
+    """导出onnx的示例输入, 字段和形状与预测时处理器的输出一致."""
+    config = model.config
+    shape = (1, ONNX_SEQ_LEN)
+    inputs = {
+        "input_ids": torch.ones(shape, dtype=torch.long),
+        "attention_mask": torch.ones(shape, dtype=torch.long),
+    }
+    if config.model_type == "layoutlmv3":
+        size = config.input_size
+        inputs["bbox"] = torch.zeros(shape + (4,), dtype=torch.long)
+        inputs["pixel_values"] = torch.zeros((1, config.num_channels, size, size))
+    elif "token_type_ids" in inspect.signature(model.forward).parameters:
+        inputs["token_type_ids"] = torch.zeros(shape, dtype=torch.long)
+    return inputs
+
+
+class OnnxModel(object):
+    """onnxruntime 推理模型.
+
+    加载时从 checkpoint 导出 model.onnx 并缓存在 checkpoint 目录下,
+    之后直接加载缓存文件, 调用方式与 transformers 模型一致
+    """
+
+    ONNX_NAME = "model.onnx"
+
+    def __init__(self, auto_cls, model_path: str):
+        """初始化函数."""
+        self.auto_cls = auto_cls
+        self.model_path = model_path
+        self.onnx_path = os.path.join(model_path, self.ONNX_NAME)
+        self.config = AutoConfig.from_pretrained(model_path)
+        if not os.path.isfile(self.onnx_path):
+            self.export()
+        self.session = self.create_session()
+
+    def create_session(self):
+        """创建onnxruntime会话."""
+        import onnxruntime  # pylint: disable=import-outside-toplevel
+
+        return onnxruntime.InferenceSession(
+            self.onnx_path, providers=onnxruntime.get_available_providers()
+        )
+
+    def export(self):
+        """导出onnx模型."""
+        model = self.auto_cls.from_pretrained(self.model_path).eval()
+        inputs = example_inputs(model)
+
+        # onnx输入顺序与forward参数顺序一致
+        params = inspect.signature(model.forward).parameters
+        names = [i for i in params if i in inputs]
+        dynamic_axes = {i: {0: "batch"} for i in names + ["logits"]}
+
+        # 新版本torch默认使用dynamo导出器, 固定使用支持 dynamic_axes 的导出器
+        kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            kwargs["dynamo"] = False
+
+        tmp_path = f"{self.onnx_path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                ({i: inputs[i] for i in names},),
+                tmp_path,
+                input_names=names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+                **kwargs,
+            )
+        os.replace(tmp_path, self.onnx_path)
+        LOGGER.info("导出onnx模型[%s]", self.onnx_path)
+
+    def __call__(self, **inputs) -> OnnxOutput:
+        """推理数据."""
+        feed = {i.name: inputs[i.name].cpu().numpy() for i in self.session.get_inputs()}
+        logits = self.session.run(["logits"], feed)[0]
+        return OnnxOutput(logits=torch.from_numpy(logits))
+
+    def to(self, *args, **kwargs):  # pylint: disable=unused-argument
+        """兼容torch接口, onnxruntime自行管理设备."""
+        return self
+
+    def eval(self):
+        """兼容torch接口."""
+        return self
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """动态INT8量化Linear层, 仅支持CPU推理.
+
+    跳过 QUANTIZE_SKIP_MODULES 中不经过 forward 调用的Linear层
+    """
+    if device.type != "cpu":
+        LOGGER.warning("动态量化仅支持CPU推理, 跳过量化")
+        return model
+
+    modules = {
+        name
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear)
+        and name.rsplit(".", 1)[-1] not in QUANTIZE_SKIP_MODULES
+    }
+    return torch.ao.quantization.quantize_dynamic(
+        model.eval(), modules, dtype=torch.qint8
+    )
+
+
+def load_pretrained_model(
+    auto_cls,
+    model_path: str,
+    backend: Optional[str] = None,
+    quantize: Optional[bool] = None,
+):
+    """按配置的推理后端加载模型.
+
+    auto_cls: transformers AutoModel 类
+    backend: torch | onnxruntime, 默认 settings.INFERENCE_BACKEND
+    quantize: 是否动态INT8量化(torch后端), 默认 settings.INFERENCE_QUANTIZE
+    """
+    if backend is None:
+        backend = settings.INFERENCE_BACKEND
+
+    if quantize is None:
+        quantize = settings.INFERENCE_QUANTIZE
+
+    if backend == "torch":
+        model = auto_cls.from_pretrained(model_path).to(device)
+        if quantize:
+            model = quantize_model(model)
+        return model
+    elif backend == "onnxruntime":
+        return OnnxModel(auto_cls, model_path)
+    else:
+        raise TypeError("backend invaild")
+
+
+def set_num_threads(num_threads: Optional[int] = None):
+    """固定torch推理线程数, 0 表示使用torch默认值."""
+    if num_threads is None:
+        num_threads = settings.TORCH_NUM_THREADS
+
+    if num_threads > 0 and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+
+def iter_modules(obj, seen: Optional[Set[int]] = None) -> Iterator[torch.nn.Module]:
+    """遍历对象属性(含list/tuple/dict)中的torch模型, 不进入模型内部."""
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+
+    if isinstance(obj, torch.nn.Module):
+        yield obj
+        return
+
+    if isinstance(obj, dict):
+        values = list(obj.values())
+    elif isinstance(obj, (list, tuple, set)):
+        values = list(obj)
+    elif isinstance(obj, (type, types.ModuleType)) or not hasattr(obj, "__dict__"):
+        return
+    else:
+        values = list(vars(obj).values())
+
+    for value in values:
+        yield from iter_modules(value, seen)
+
+
+def share_model_memory(obj) -> int:
+    """把对象中的torch模型权重移入共享内存, 返回共享的模型数量.
+
+    spawn子进程通过 torch.multiprocessing 序列化时只传递共享内存句柄,
+    多个进程共用同一份权重
+    """
+    count = 0
+    for module in iter_modules(obj):
+        module.share_memory()
+        count += 1
+    return count
+
+
+def warmup_predictor(predictor, name: Optional[str] = None) -> bool:
+    """预热推理对象.
+
+    调用 predictor.warmup() 以代表性输入执行一次前向推理, 提前完成
+    权重加载、onnx导出和算子初始化, settings.INFERENCE_WARMUP 关闭时跳过;
+    返回是否可以就绪, 预热失败时返回False, 调用方不应标记就绪
+    """
+    warmup = getattr(predictor, "warmup", None)
+    if not settings.INFERENCE_WARMUP or warmup is None:
+        return True
+
+    name = name if name else type(predictor).__name__
+    start = time.perf_counter()
+    try:
+        warmup()
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.error("模型预热失败[%s]", name, exc_info=True)
+        return False
+    LOGGER.info("模型预热[%s][%.3fs]", name, time.perf_counter() - start)
+    return True
+
+
+class InferenceExecutor(Executor):
+    """单线程推理线程池.
+
+    首次提交时创建线程, 序列化时不包含线程, 模型对象可整体传给子进程
+    """
+
+    def __init__(self, name: str):
+        """初始化函数."""
+        self.name = name
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:  # type: ignore
+        """提交任务."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=self.name
+                )
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, **kwargs):
+        """关闭线程池."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait, **kwargs)
+
+    def __getstate__(self):
+        """序列化时只保留名称."""
+        return {"name": self.name}
+
+    def __setstate__(self, state):
+        """反序列化."""
+        self.__init__(state["name"])
+
+
+@contextlib.contextmanager
+def inference_context():
+    """推理上下文, 不记录autograd计算图."""
+    with torch.inference_mode():
+        yield
+
+
+class InferenceEngine(object):
+    """统一推理入口.
+
+    模型切换到 eval 模式, 固定线程数, 在 inference_mode 下执行前向推理,
+    并记录单次推理耗时; 异步调用时在单线程推理线程中串行执行前向推理,
+    不阻塞事件循环上其它任务的IO
+    """
+
+    def __init__(self, model, name: Optional[str] = None):
+        """初始化函数."""
+        set_num_threads()
+        self.model = model.eval()
+        self.name = name if name else type(model).__name__
+        self.calls = 0
+        self.total_time = 0.0
+        self.executor = InferenceExecutor(f"inference-{self.name}")
+
+    def __setstate__(self, state):
+        """反序列化, 子进程中重新固定线程数."""
+        set_num_threads()
+        self.__dict__.update(state)
+
+    async def submit(self, func: Callable[..., T], *args) -> T:
+        """在推理线程中执行, 同一模型的前向推理串行执行."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def forward(self, **inputs):
+        """异步前向推理."""
+        return await self.submit(partial(self.__call__, **inputs))
+
+    @property
+    def config(self):
+        """模型配置."""
+        return self.model.config
+
+    def __call__(self, **inputs):
+        """前向推理."""
+        start = time.perf_counter()
+        with inference_context():
+            outputs = self.model(**inputs)
+
+        cost = time.perf_counter() - start
+        self.calls += 1
+        self.total_time += cost
+        LOGGER.debug("推理耗时[%s][%.3fs]", self.name, cost)
+        return outputs
@@ -9,7 +9,8 @@
 TAG: https://github.com/microsoft/table-transformer/tree/main
 """
 
-from copy import deepcopy
+from bisect import bisect_left
+from bisect import bisect_right
 from typing import List
 
 from fitz import Rect
@@ -114,33 +115,53 @@ def sort_objects_cells(cells: List[CellSymbol], max_row: int) -> List[CellSymbol
     return cells
 
 
+class WordCenterIndex(object):
+    """文本中心点区间索引.
+
+    按中心点x坐标排序, 单元格只检索x区间内的文本, 再按y坐标过滤
+    """
+
+    def __init__(self, words: List[WordSymbol]):
+        """初始化函数."""
+        self.words = words
+        self.centers = [(word.center_x, word.center_y) for word in words]
+        self.order = sorted(range(len(words)), key=lambda i: self.centers[i][0])
+        self.keys = [self.centers[i][0] for i in self.order]
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> List[WordSymbol]:
+        """查询中心点落在方框内的文本, 保持原始文本顺序."""
+        start = bisect_left(self.keys, x0)
+        end = bisect_right(self.keys, x1)
+        indexs = sorted(
+            i for i in self.order[start:end] if y0 <= self.centers[i][1] <= y1
+        )
+        return [self.words[i] for i in indexs]
+
+
 def padding_table_cells_text(
     words: List[WordSymbol], tables: List[TabelInfo]
 ) -> List[TabelInfo]:
     """ocr识别内容填充到单元格."""
+    index = WordCenterIndex(words)
     for table in tables:
         bboxs = []
         for cell in table.cells:
-            combits = [
-                word
-                for word in words
-                if cell.x0 <= word.center_x <= cell.x1
-                and cell.y0 <= word.center_y <= cell.y1
-            ]
-
-            bbox = deepcopy(cell)
-
-            if combits:
-                combits = merge_block_(combits)
-                cell.text = " ".join([combit.text for combit in combits])
-                bbox.x0 = min(combit.x0 for combit in combits)
-                bbox.y0 = min(combit.y0 for combit in combits)
-                bbox.x1 = max(combit.x1 for combit in combits)
-                bbox.y1 = max(combit.y1 for combit in combits)
-                bbox.text = cell.text
-                bboxs.append(bbox)
-            else:
-                bboxs.append(bbox)
+            combits = index.query(cell.x0, cell.y0, cell.x1, cell.y1)
+            if not combits:
+                bboxs.append(cell)
+                continue
+
+            combits = merge_block_(combits)
+            cell.text = " ".join([combit.text for combit in combits])
+            bbox = cell.copy(
+                update={
+                    "x0": min(combit.x0 for combit in combits),
+                    "y0": min(combit.y0 for combit in combits),
+                    "x1": max(combit.x1 for combit in combits),
+                    "y1": max(combit.y1 for combit in combits),
+                }
+            )
+            bboxs.append(bbox)
 
         table.bbox_cells = bboxs
     return tables
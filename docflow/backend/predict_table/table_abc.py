@@ -25,6 +25,9 @@ class TableDetectionBase(ABC):
         """推理表格位置."""
         raise NotImplementedError
 
+    def warmup(self):
+        """预热模型, 默认不处理."""
+
 
 class TableStructureBase(ABC):
     """表格结构识别抽线类."""
@@ -37,3 +40,12 @@ class TableStructureBase(ABC):
         tables: 表格对象 TableDetectionBase
         """
         raise NotImplementedError
+
+    def predict_batch(
+        self, images: List[Image.Image], padding_cell=True
+    ) -> List[List[CellSymbol]]:
+        """批量推理表格结构, 默认逐张推理."""
+        return [self.predict(image, padding_cell) for image in images]
+
+    def warmup(self):
+        """预热模型, 默认不处理."""
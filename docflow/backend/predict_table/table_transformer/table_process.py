@@ -9,7 +9,7 @@
 from typing import List
 from typing import TypeVar
 
-from fitz import Rect  # pylint: disable=import-error
+import numpy as np
 
 from ..schemas import CellSymbol
 from ..schemas import WordScoresSymbol
@@ -37,6 +37,13 @@ def sort_objects_top_to_bottom(objs: List[T]):
     return sorted(objs, key=lambda k: k.y0 + k.y1)
 
 
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    """计算方框面积, 无效方框面积为0."""
+    return np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(
+        boxes[:, 3] - boxes[:, 1], 0
+    )
+
+
 def nms(
     objects: List[T],
     match_criteria="object2_overlap",
@@ -58,37 +65,42 @@ def nms(
     if len(objects) == 0:
         return []
 
+    if match_criteria not in ("object1_overlap", "object2_overlap", "iou"):
+        raise TypeError("match_criteria invaild")
+
     objects = sort_objects_by_score(objects, reverse=keep_higher)
 
-    num_objects = len(objects)
-    suppression = [False for obj in objects]
-
-    for object2_num in range(1, num_objects):
-        object2_rect = Rect(objects[object2_num].bbox)
-        object2_area = object2_rect.get_area()  # type: ignore
-        for object1_num in range(object2_num):
-            if not suppression[object1_num]:
-                object1_rect = Rect(objects[object1_num].bbox)
-                object1_area = object1_rect.get_area()  # type: ignore
-                intersect_area = object1_rect.intersect(object2_rect).get_area()  # type: ignore
-                try:
-                    if match_criteria == "object1_overlap":
-                        metric = intersect_area / object1_area
-                    elif match_criteria == "object2_overlap":
-                        metric = intersect_area / object2_area
-                    elif match_criteria == "iou":
-                        metric = intersect_area / (
-                            object1_area + object2_area - intersect_area
-                        )
-                    else:
-                        raise TypeError("match_criteria invaild")
-
-                    if metric >= match_threshold:
-                        suppression[object2_num] = True
-                        break
-                except Exception:
-                    # Intended to recover from divide-by-zero
-                    pass
+    # 两两相交面积矩阵 [object2, object1]
+    boxes = np.array([obj.bbox for obj in objects], dtype=np.float64)
+    areas = box_areas(boxes)
+    inter_x0 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    inter_y0 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    inter_x1 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    inter_y1 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+    intersect_areas = np.maximum(inter_x1 - inter_x0, 0) * np.maximum(
+        inter_y1 - inter_y0, 0
+    )
+
+    if match_criteria == "object1_overlap":
+        denominator = np.broadcast_to(areas[None, :], intersect_areas.shape)
+    elif match_criteria == "object2_overlap":
+        denominator = np.broadcast_to(areas[:, None], intersect_areas.shape)
+    else:
+        denominator = areas[:, None] + areas[None, :] - intersect_areas
+
+    # 面积为0的组合不参与抑制
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matched = (denominator != 0) & (
+            intersect_areas / denominator >= match_threshold
+        )
+
+    # 只有未被抑制的高分对象才能抑制后续对象
+    matched = np.tril(matched, -1)
+    suppression = np.zeros(len(objects), dtype=bool)
+    for object2_num in np.flatnonzero(matched.any(axis=1)):
+        suppression[object2_num] = np.any(
+            matched[object2_num, :object2_num] & ~suppression[:object2_num]
+        )
 
     return [obj for idx, obj in enumerate(objects) if not suppression[idx]]
 
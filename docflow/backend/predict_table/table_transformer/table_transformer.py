@@ -15,6 +15,8 @@ from PIL import Image
 from transformers import AutoImageProcessor
 from transformers import AutoModelForObjectDetection
 
+from ...predict_engine import InferenceEngine
+from ...predict_engine import load_pretrained_model
 from ...predict_utils import find_registry_path
 from ...settings import settings
 from ..schemas import CellSymbol
@@ -29,36 +31,57 @@ device = torch.device("cuda" if torch.cuda.is_available() else "cpu")  # type: i
 
 
 class TableTransformerBase(object):
-    """表格基类."""
+    """表格基类.
+
+    WARMUP_SIZE: 预热输入图片尺寸
+    """
+
+    WARMUP_SIZE = (1240, 1754)
 
     def __init__(self, module_path):
         """初始化函数."""
         self.model_path = find_registry_path(module_path)
         self.image_processor = AutoImageProcessor.from_pretrained(self.model_path)
-        self.model = AutoModelForObjectDetection.from_pretrained(self.model_path).to(
-            device
+        # DETR后处理依赖pred_boxes, 固定使用torch后端
+        self.model = load_pretrained_model(
+            AutoModelForObjectDetection, self.model_path, backend="torch"
         )
+        self.engine = InferenceEngine(self.model)
+
+    def warmup(self):
+        """预热模型, 以典型尺寸的空白图片执行一次前向推理."""
+        self._predict_batch([Image.new("RGB", self.WARMUP_SIZE, "white")])
 
     def _predict(self, image: Image.Image):
-        inputs = self.image_processor(images=image, return_tensors="pt")
-        outputs = self.model(**inputs.to(device))  # type: ignore
+        yield from self._predict_batch([image])[0]
+
+    def _predict_batch(self, images: List[Image.Image]):
+        """批量推理, 返回每张图片的 (score, label, box) 列表."""
+        # 批次内图片由image_processor补齐到相同尺寸, 并生成pixel_mask
+        inputs = self.image_processor(images=images, return_tensors="pt")
+        outputs = self.engine(**inputs.to(device))  # type: ignore
 
         # convert outputs (bounding boxes and class logits) to COCO API
-        target_sizes = [image.size[::-1]]
+        target_sizes = [image.size[::-1] for image in images]
         results_ = self.image_processor.post_process_object_detection(
             outputs, threshold=0.6, target_sizes=target_sizes
         )
-        for results in results_:
-            for score, label, box in zip(  # type: ignore
-                results["scores"], results["labels"], results["boxes"]
-            ):
-                label_ = self.model.config.id2label[label.item()]  # type: ignore
-                yield score, label_, box
+        return [
+            [
+                (score, self.model.config.id2label[label.item()], box)  # type: ignore
+                for score, label, box in zip(  # type: ignore
+                    results["scores"], results["labels"], results["boxes"]
+                )
+            ]
+            for results in results_
+        ]
 
 
 class TableTransformerDetection(TableTransformerBase, TableDetectionBase):
     """表格发现."""
 
+    WARMUP_SIZE = (1240, 1754)  # A4 150dpi 整页
+
     def __init__(self, module_path: Optional[str] = None):
         """初始化函数."""
         if module_path is None:
@@ -105,6 +128,8 @@ class TableTransformerDetection(TableTransformerBase, TableDetectionBase):
 class TableTransformerStructure(TableTransformerBase, TableStructureBase):
     """表格结构解析."""
 
+    WARMUP_SIZE = (1000, 600)  # 典型表格裁剪尺寸(含padding)
+
     def __init__(self, module_path: Optional[str] = None):
         """初始化函数."""
         if module_path is None:
@@ -118,8 +143,23 @@ class TableTransformerStructure(TableTransformerBase, TableStructureBase):
 
     def predict(self, image: Image.Image, padding_cell=True) -> List[CellSymbol]:
         """推理表格位置."""
+        return self.parse_cells(self._predict(image), padding_cell)
+
+    def predict_batch(
+        self, images: List[Image.Image], padding_cell=True
+    ) -> List[List[CellSymbol]]:
+        """批量推理表格结构, 按 TABLE_STRUCTURE_BATCH_SIZE 分批前向推理."""
+        batch_size = max(settings.TABLE_STRUCTURE_BATCH_SIZE, 1)
+        rrr: List[List[CellSymbol]] = []
+        for index in range(0, len(images), batch_size):
+            for results in self._predict_batch(images[index : index + batch_size]):
+                rrr.append(self.parse_cells(results, padding_cell))
+        return rrr
+
+    def parse_cells(self, results, padding_cell=True) -> List[CellSymbol]:
+        """转换推理结果到单元格."""
         cells: List[CellSymbol] = []
-        for score, label, box in self._predict(image):
+        for score, label, box in results:
             if label == "table":
                 continue
 
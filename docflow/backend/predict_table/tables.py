@@ -7,13 +7,19 @@
 @desc: 表格识别
 """
 
+import asyncio
+from functools import partial
 from typing import List
 from typing import Optional
 from typing import Tuple
+from typing import Union
 
 from PIL import Image
 
 from ..google_ocr import ocr_image
+from ..predict_engine import InferenceExecutor
+from ..predict_utils import ImageData
+from ..predict_utils import download_image_data
 from .cells import objects_to_cells
 from .cells import padding_table_cells_text
 from .table_abc import CellSymbol
@@ -42,10 +48,17 @@ class TableStructurePredict:
         self.detection = detection
         self.structure = structure
         self.paddings = paddings
+        # 表格检测和结构识别在单线程中串行推理, 不阻塞事件循环
+        self.executor = InferenceExecutor("inference-tables")
+
+    def warmup(self):
+        """预热表格发现和表格结构模型."""
+        self.detection.warmup()
+        self.structure.warmup()
 
     async def predict(
         self,
-        image: Image.Image,
+        image: Union[Image.Image, ImageData],
         ocr_uri: Optional[str] = None,
         fix_table_boxs: bool = True,
         padding_cell: bool = True,
@@ -53,9 +66,18 @@ class TableStructurePredict:
         without_detection: bool = False,
     ) -> List[TabelInfo]:
         """推理表格单元格."""
-        ocrdata = await ocr_image(image, ocr_uri, download_timeout)
-        tables = self.predict_tables(
-            image, fix_table_boxs, padding_cell, without_detection=without_detection
+        image_data = await download_image_data(image, download_timeout)
+        ocrdata = await ocr_image(image_data, ocr_uri, download_timeout)
+        loop = asyncio.get_running_loop()
+        tables = await loop.run_in_executor(
+            self.executor,
+            partial(
+                self.predict_tables,
+                image_data.rgb,
+                fix_table_boxs,
+                padding_cell,
+                without_detection=without_detection,
+            ),
         )
         tables = padding_table_cells_text(ocrdata, tables)
         return tables
@@ -78,6 +100,7 @@ class TableStructurePredict:
         def _clip(val, _max):
             return min(max(val, 0), _max)
 
+        crop_images = []
         for table in tables:
             table.x0 -= self.paddings[0]
             table.y0 -= self.paddings[1]
@@ -90,12 +113,13 @@ class TableStructurePredict:
             table.x1 = _clip(table.x1, image.size[0])
             table.y1 = _clip(table.y1, image.size[1])
 
-            crop_image = image.crop(
-                (int(table.x0), int(table.y0), int(table.x1), int(table.y1))
+            crop_images.append(
+                image.crop((int(table.x0), int(table.y0), int(table.x1), int(table.y1)))
             )
 
-            # 推理结构
-            cells = self.predict_strucrture(crop_image, padding_cell)
+        # 单页所有表格批量推理结构
+        cells_list = self.predict_strucrture_batch(crop_images, padding_cell)
+        for table, cells in zip(tables, cells_list):
             if not cells:
                 continue
 
@@ -128,6 +152,14 @@ class TableStructurePredict:
         """
         return self.structure.predict(image, padding_cell)
 
+    def predict_strucrture_batch(
+        self, images: List[Image.Image], padding_cell=True
+    ) -> List[List[CellSymbol]]:
+        """批量推理表格结构."""
+        if not images:
+            return []
+        return self.structure.predict_batch(images, padding_cell)
+
     def predict_detection(self, image: Image.Image) -> List[TabelInfo]:
         """推理表格位置."""
         return self.detection.predict(image)
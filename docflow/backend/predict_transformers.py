@@ -29,7 +29,11 @@ from transformers.models.auto.processing_auto import AutoProcessor
 
 from .google_ocr import WordSymbol
 from .google_ocr import ocr_image
-from .predict_utils import download_image
+from .predict_batch import DynamicBatcher
+from .predict_engine import InferenceEngine
+from .predict_engine import load_pretrained_model
+from .predict_utils import ImageData
+from .predict_utils import download_image_data
 from .predict_utils import find_registry_path
 from .settings import settings
 
@@ -37,6 +41,9 @@ from .settings import settings
 # from .predict_utils import LAYOUTLMV3_MODULE
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")  # type: ignore # pylint: disable=no-member
+WARMUP_IMAGE_SIZE = (1240, 1754)  # A4 150dpi
+WARMUP_WORDS = ["warmup"]
+WARMUP_BOXES = [[0, 0, 100, 100]]
 
 
 def load_image(image_path):
@@ -122,7 +129,7 @@ class LabelstudDocOcrDataProcess:
 
     async def generate_image_examples(
         self,
-        file: Union[bytes, str, Image.Image],
+        file: Union[bytes, str, Image.Image, ImageData],
         ocr_uri: Optional[str] = None,
         download_timeout: Optional[int] = None,
     ):
@@ -130,13 +137,11 @@ class LabelstudDocOcrDataProcess:
 
         files: to see ./tests/data/export_data.json
         """
-        if isinstance(file, Image.Image):
-            image = file
-        else:
-            image = await download_image(file, download_timeout)
+        image_data = await download_image_data(file, download_timeout)
+        image = image_data.rgb
 
         # 如果字太多，放弃推理
-        ocrdata = await ocr_image(image, ocr_uri, download_timeout)
+        ocrdata = await ocr_image(image_data, ocr_uri, download_timeout)
         if not ocrdata:
             return {
                 "tokens": [],
@@ -177,21 +182,46 @@ class Layoutlmv3Predict(object):
         self.model_path = find_registry_path(dst_path)
         self.process = LabelstudDocOcrDataProcess()
         self.processor = AutoProcessor.from_pretrained(self.model_path, apply_ocr=False)
-        self.loaded_model = AutoModelForTokenClassification.from_pretrained(
-            self.model_path
-        ).to(device)
-
-    @staticmethod
-    def compare_boxes(x, y):
-        """比较方格."""
-        bbox1 = np.array([c for c in x])
-        bbox2 = np.array([c for c in y])
-        equal = np.array_equal(bbox1, bbox2)
-        return equal
+        self.loaded_model = load_pretrained_model(
+            AutoModelForTokenClassification, self.model_path
+        )
+        self.engine = InferenceEngine(self.loaded_model)
+        self.batcher: Optional[DynamicBatcher] = None
+        if settings.KEYINFO_BATCH_SIZE > 1:
+            self.batcher = DynamicBatcher(
+                self.forward,
+                settings.KEYINFO_BATCH_SIZE,
+                settings.KEYINFO_BATCH_WAIT,
+                self.engine.executor,
+            )
+
+    def warmup(self):
+        """预热模型, 以512 tokens的输入执行一次前向推理."""
+        encoding = self.processor(
+            Image.new("RGB", WARMUP_IMAGE_SIZE, "white"),
+            WARMUP_WORDS,
+            boxes=WARMUP_BOXES,
+            truncation=True,
+            padding="max_length",
+            max_length=512,
+            return_tensors="pt",
+        )
+        self.forward(encoding.data)
+
+    def forward(self, inputs) -> torch.Tensor:
+        """模型前向推理, 返回logits."""
+        inputs = {key: val.to(device) for key, val in inputs.items()}
+        return self.engine(**inputs).logits
+
+    async def forward_batch(self, inputs) -> torch.Tensor:
+        """推理请求, 开启批处理时合并并发请求."""
+        if self.batcher is None:
+            return await self.engine.submit(self.forward, inputs)
+        return await self.batcher.predict(inputs)
 
     async def predict(
         self,
-        image_uri: Union[str, bytes],
+        image_uri: Union[str, bytes, Image.Image, ImageData],
         ocr_uri: Optional[str] = None,
         download_timeout=None,
     ) -> Tuple[Image.Image, List[WordSymbol]]:
@@ -225,11 +255,7 @@ class Layoutlmv3Predict(object):
         offset_mapping = encoding.pop("offset_mapping")
         encoding.pop("overflow_to_sample_mapping")
 
-        with torch.no_grad():
-            encoding = encoding.to(device)
-            outputs = self.loaded_model(**encoding)
-
-        logits = outputs.logits
+        logits = await self.forward_batch(encoding.data)
         predictions = logits.argmax(-1).squeeze().tolist()
         token_boxes = encoding.bbox.squeeze().tolist()
         width, height = image.size
@@ -249,6 +275,7 @@ class Layoutlmv3Predict(object):
                     id2label[pred_][0],
                     iob_to_label(id2label[pred_]),
                     unnormalize_box(box_, width, height),
+                    tuple(box_),
                 )
                 for idx, (pred_, box_) in enumerate(zip(pred, box))
                 if (not is_subword[idx])
@@ -258,26 +285,22 @@ class Layoutlmv3Predict(object):
             else:
                 true_predictions += datas[1 + stride - sum(is_subword[: 1 + stride]) :]
 
+        # 归一化方框 -> 原始文本索引, 同一方框取第一个文本
+        word_index = {}
+        for word, oldbox in zip(words, boxes):  # type: ignore
+            word_index.setdefault(tuple(oldbox), word)
+
         tokens = [
             WordSymbol(
                 x0=box[0],
                 y0=box[1],
                 x1=box[2],
                 y1=box[3],
-                text=next(
-                    (
-                        word
-                        for word, oldbox in zip(words, boxes)  # type: ignore
-                        if self.compare_boxes(
-                            box, unnormalize_box(oldbox, width, height)
-                        )
-                    ),
-                    "",
-                ),
+                text=word_index.get(norm_box, ""),
                 label=prediction,
                 iob=iob,
             )
-            for iob, prediction, box in true_predictions
+            for iob, prediction, box, norm_box in true_predictions
             if any(box) and prediction != "other"  # 存在全部0的方框，采取过滤操作
         ]
         return image, list(set(tokens))
@@ -314,17 +337,31 @@ class Layoutlmv3ClassificationPredict(object):
 
         self.dst_path = dst_path
         self.model_path = find_registry_path(dst_path)
-        self.loaded_model = AutoModelForSequenceClassification.from_pretrained(
-            self.model_path
-        ).to(device)
+        self.loaded_model = load_pretrained_model(
+            AutoModelForSequenceClassification, self.model_path
+        )
         feature_extractor = LayoutLMv3FeatureExtractor(apply_ocr=False)
         tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        self.engine = InferenceEngine(self.loaded_model)
         self.process = LabelstudDocOcrDataProcess()
         self.processor = LayoutLMv3Processor(feature_extractor, tokenizer)
 
+    def warmup(self):
+        """预热模型, 以512 tokens的输入执行一次前向推理."""
+        encoding = self.processor(
+            Image.new("RGB", WARMUP_IMAGE_SIZE, "white"),
+            WARMUP_WORDS,
+            boxes=WARMUP_BOXES,
+            return_tensors="pt",
+            truncation=True,
+            padding="max_length",
+            max_length=512,
+        )
+        self.engine(**encoding.to(device))
+
     async def predict(
         self,
-        image_uri: Union[str, bytes, Image.Image],
+        image_uri: Union[str, bytes, Image.Image, ImageData],
         ocr_uri: Optional[str] = None,
         download_timeout=None,
     ) -> str:
@@ -351,7 +388,7 @@ class Layoutlmv3ClassificationPredict(object):
             max_length=512,
         )
         encoding = encoding.to(device)
-        outputs = self.loaded_model(**encoding)
+        outputs = await self.engine.forward(**encoding)
         logits = outputs.logits
         predicted_class_idx = logits.argmax(-1).item()
         return self.loaded_model.config.id2label[predicted_class_idx]
@@ -369,12 +406,24 @@ class Layoutlmv3ClassificationBertPredict(object):
 
         self.dst_path = dst_path
         self.model_path = find_registry_path(dst_path)
-        self.loaded_model = AutoModelForSequenceClassification.from_pretrained(
-            self.model_path
-        ).to(device)
+        self.loaded_model = load_pretrained_model(
+            AutoModelForSequenceClassification, self.model_path
+        )
+        self.engine = InferenceEngine(self.loaded_model)
         self.process = LabelstudDocOcrDataProcess()
         self.processor = AutoProcessor.from_pretrained(self.model_path)
 
+    def warmup(self):
+        """预热模型, 以512 tokens的输入执行一次前向推理."""
+        encoding = self.processor(
+            " ".join(WARMUP_WORDS),
+            return_tensors="pt",
+            truncation=True,
+            padding="max_length",
+            max_length=512,
+        )
+        self.engine(**encoding.to(device))
+
     def clean_text(self, text):
         """数据清理."""
         text = text.lower()
@@ -402,7 +451,7 @@ class Layoutlmv3ClassificationBertPredict(object):
 
     async def predict(
         self,
-        image_uri: Union[str, bytes, Image.Image],
+        image_uri: Union[str, bytes, Image.Image, ImageData],
         ocr_uri: Optional[str] = None,
         download_timeout=None,
     ) -> str:
@@ -427,7 +476,7 @@ class Layoutlmv3ClassificationBertPredict(object):
             max_length=512,
         )
         encoding = encoding.to(device)
-        outputs = self.loaded_model(**encoding)
+        outputs = await self.engine.forward(**encoding)
         logits = outputs.logits
         predicted_class_idx = logits.argmax(-1).item()
         return self.loaded_model.config.id2label[predicted_class_idx]
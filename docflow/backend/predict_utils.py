@@ -17,20 +17,27 @@ from typing import Union
 from urllib.parse import urlparse
 
 import aioboto3
-import aiohttp
 import filetype
 import pydantic
 from aiobotocore.config import AioConfig
 from humps import camelize
 from PIL import Image
 
+from docflow.utils.download import DownloadSession
+from docflow.utils.images import ImageData
+from docflow.utils.loops import LoopClient
+from docflow.utils.loops import release_s3_client
+
 from .settings import settings
 
 logger = logging.getLogger()
 
 
 class S3Session:
-    """S3Session."""
+    """S3Session.
+
+    每个事件循环持有一个长连接客户端, 首次使用时创建, 由 close 关闭
+    """
 
     def __init__(
         self,
@@ -46,19 +53,27 @@ class S3Session:
         self.region_name = region_name
         self.config = AioConfig(signature_version="s3v4")
         self.session = aioboto3.Session()
+        self.clients = LoopClient(self.create_client, release_s3_client)
 
-    @contextlib.asynccontextmanager
-    async def client(self):
-        """创建客户端."""
-        async with self.session.client(
+    def create_client(self):
+        """创建新的客户端上下文."""
+        return self.session.client(
             "s3",
             region_name=self.region_name,
             endpoint_url=self.endpoint_url,
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
             config=self.config,
-        ) as s3cli:
-            yield s3cli
+        )
+
+    async def close(self):
+        """关闭当前事件循环的长连接客户端."""
+        await self.clients.close()
+
+    @contextlib.asynccontextmanager
+    async def client(self):
+        """获取当前事件循环的长连接客户端."""
+        yield await self.clients.get()
 
 
 url_ = urlparse(settings.S3_LOCAL_URI)
@@ -85,6 +100,19 @@ def is_vaild_download_url(url: str) -> bool:
     )
 
 
+downloader = DownloadSession(
+    settings.DOWNLOAD_POOL_SIZE,
+    settings.DOWNLOAD_POOL_PER_HOST,
+    s3_client=s3client.client,
+)
+
+
+async def close_clients():
+    """关闭当前事件循环的下载会话和S3长连接客户端."""
+    await downloader.close()
+    await s3client.close()
+
+
 async def download_file(url: Union[str, bytes], timeout: Optional[int] = None) -> bytes:
     """获取文件路径."""
     if not timeout:
@@ -93,46 +121,39 @@ async def download_file(url: Union[str, bytes], timeout: Optional[int] = None) -
     if isinstance(url, bytes):
         return url
 
-    # 签名重新下载
     if url.startswith("s3://"):
-        s3_ = urlparse(url)
-        bucket = s3_.netloc
-        object_id = s3_.path
-        async with s3client.client() as s3cli:
-            url = await s3cli.generate_presigned_url(
-                ClientMethod="get_object",
-                Params={
-                    "Bucket": bucket,
-                    "Key": object_id,
-                },
-                ExpiresIn=180,
-            )
+        return await downloader.get_s3(url, timeout)
 
     if not is_vaild_download_url(url):
         raise TypeError("download error")
 
     # 只允许open用于测试
     if url.startswith("http://") or url.startswith("https://"):
-        ttt = aiohttp.ClientTimeout(total=timeout)  # type: ignore
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=ttt) as rrr:
-                data = await rrr.read()
+        return await downloader.get(url, timeout)
     else:
         raise TypeError("url invaild")
 
-    if b"NoSuchKey" in data or b"<Error>" in data:
-        raise TypeError("rsp error")
-    return data
+
+async def download_image_data(
+    url: Union[str, bytes, Image.Image, ImageData],
+    download_timeout: Optional[int] = None,
+) -> ImageData:
+    """下载图片, 保留原始编码数据."""
+    if isinstance(url, ImageData):
+        return url
+    elif isinstance(url, Image.Image):
+        return ImageData(image=url)
+
+    data = await download_file(url, download_timeout)
+    return ImageData(data=data)
 
 
 async def download_image(
     url: Union[str, bytes], download_timeout: Optional[int] = None
 ) -> Image.Image:
     """下载文件."""
-    data = await download_file(url, download_timeout)
-    data_ = BytesIO(data)
-    image = Image.open(data_).convert("RGB")
-    return image
+    image_data = await download_image_data(url, download_timeout)
+    return image_data.rgb
 
 
 def image_to_bytes(xxx: Image.Image):
@@ -7,6 +7,8 @@
 @desc: 推理对象
 """
 
+import asyncio
+from functools import partial
 from typing import Optional
 from typing import Union
 
@@ -21,7 +23,9 @@ from scipy.ndimage import interpolation
 from ultralytics import YOLO
 from ultralytics.utils import callbacks
 
-from .predict_utils import download_image
+from .predict_engine import InferenceExecutor
+from .predict_utils import ImageData
+from .predict_utils import download_image_data
 from .predict_utils import find_registry_path
 from .settings import settings
 
@@ -103,39 +107,44 @@ class YoloDataProcess:
         self.dst_path = dst_path
         self.model_path = find_registry_path(dst_path)
         self.model = YOLO(self.model_path)
+        # 模型推理在单线程中串行执行, 不阻塞事件循环
+        self.executor = InferenceExecutor("inference-yolo")
+
+    def warmup(self):
+        """预热模型, 以空白图片执行一次前向推理."""
+        self.model(Image.new("RGB", (1240, 1754), "white"), device=device)
 
     async def degree_predict(
         self,
-        image_uri: Union[bytes, str, Image.Image],
+        image_uri: Union[bytes, str, Image.Image, ImageData],
         download_timeout=None,
     ) -> float:
         """generate_examples.
 
         files: to see ./tests/data/export_data.json
         """
-        if isinstance(image_uri, Image.Image):
-            image = image_uri
-        else:
-            image = await download_image(image_uri, download_timeout)
+        image_data = await download_image_data(image_uri, download_timeout)
+        image = image_data.rgb
 
         degree = estimate_skew_angle(np.array(image.convert("L")))
         return -1 * degree
 
     async def predict(
         self,
-        image_uri: Union[bytes, str, Image.Image],
+        image_uri: Union[bytes, str, Image.Image, ImageData],
         download_timeout=None,
     ) -> float:
         """generate_examples.
 
         files: to see ./tests/data/export_data.json
         """
-        if isinstance(image_uri, Image.Image):
-            image = image_uri
-        else:
-            image = await download_image(image_uri, download_timeout)
+        image_data = await download_image_data(image_uri, download_timeout)
+        image = image_data.rgb
 
-        results = self.model(image, device=device)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self.executor, partial(self.model, image, device=device)
+        )
         rotate = results[0].names[
             int(results[0].probs.data.argsort(0, descending=True)[:1].tolist()[0])
         ]
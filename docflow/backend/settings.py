@@ -7,6 +7,7 @@
 @desc: 数据库Session
 """
 import os
+from typing import Dict
 
 from pydantic import BaseSettings
 from pydantic.networks import HttpUrl
@@ -53,6 +54,8 @@ class Settings(BaseSettings):
     MIN_RETRY_SLEEPTIME: int = 1  # 最小重试延时
     MAX_RETRY_SLEEPTIME: int = 3  # 最大重试延时
     DOWNLOAD_TIMEOUT: int = 5 * 60  # 下载pdf超时时间
+    DOWNLOAD_POOL_SIZE: int = 100  # 下载连接池大小
+    DOWNLOAD_POOL_PER_HOST: int = 16  # 下载连接池单个主机连接数
     WEBHOOK_TIMEOUT: int = 5 * 60  # 发送webhook 超时时间
     PREDICT_TIMEOUT: int = 5 * 60  # 预测模型超时事件
     TASK_EXPIRE_TTL: int = 2 * 60  # 任务锁时长
@@ -113,6 +116,9 @@ class Settings(BaseSettings):
 
     GOOGLE_API: str = HttpUrl("http://8.210.121.25:20000/gapi", scheme="http")  # type: ignore
     GOOGLE_API_TIMEOUT: int = 30 * 60
+    GOOGLE_API_CONCURRENCY: int = 8  # 单进程最大并发识别请求(连接池大小)
+    OCR_CACHE_SIZE: int = 64  # 进程内OCR结果缓存页数, 0 关闭
+    OCR_CACHE_S3: bool = True  # OCR结果是否缓存至S3 words目录
     GOOGLE_API_WEB_SIGN_SALT: str = ""
 
     # ----------------------------------------------
@@ -125,6 +131,17 @@ class Settings(BaseSettings):
     CONDUCTOR_WORKER_INTERVAL: float = 1
     CONDUCTOR_WORKER_DOMAIN_AI: str = ""
     CONDUCTOR_WORKER_DEBUG: bool = False
+    # 各任务类型单进程最大并发任务数, 例如 {"worker_表格识别": 4}, 未配置时为1
+    CONDUCTOR_WORKER_CONCURRENCY: Dict[str, int] = {}
+    # 各任务类型worker进程数, 例如 {"worker_图片关键信息识别": 2}, 未配置时为1, 0 表示不启动
+    CONDUCTOR_WORKER_REPLICAS: Dict[str, int] = {}
+    CONDUCTOR_WORKER_BATCH_SIZE: int = 0  # 单次最多拉取任务数, 0 表示按空闲槽位拉取
+    CONDUCTOR_WORKER_MAX_INTERVAL: float = 10  # 队列为空时拉取间隔退避上限(秒)
+    CONDUCTOR_WORKER_DRAIN_TIMEOUT: float = 30  # 退出前等待任务完成并回写结果的上限(秒)
+    # 父进程加载模型并放入共享内存, 各worker进程共用一份权重(onnxruntime后端不生效)
+    CONDUCTOR_WORKER_SHARE_MODEL: bool = False
+    # worker进程预热完成后写入就绪文件的目录, 为空时不写入
+    CONDUCTOR_WORKER_READY_DIR: str = ""
 
     # ----------------------------------------------
     #        请求后端地址
@@ -141,6 +158,13 @@ class Settings(BaseSettings):
     KEYINFO_API: str = ""
     WORD_LIMIT: int = 2048
 
+    # ----------------------------------------------
+    #        动态批处理
+    # ----------------------------------------------
+
+    KEYINFO_BATCH_SIZE: int = 1  # 单批次最大窗口数, 小于等于1时不启用批处理
+    KEYINFO_BATCH_WAIT: float = 0.005  # 批次最大等待时长(秒)
+
     # ----------------------------------------------
     #        默认预测模型接口
     # ----------------------------------------------
@@ -151,6 +175,16 @@ class Settings(BaseSettings):
     PDFSIDE_MODULE: str = "modules/pdfside"
     TABLE_STRUCTURE_MODULE: str = "modules/tabletransformer_structure"
     TABLE_DETECTION_MODULE: str = "modules/tabletransformer_detection"
+    TABLE_STRUCTURE_BATCH_SIZE: int = 8  # 单页表格结构识别批次大小
+
+    # ----------------------------------------------
+    #        推理后端
+    # ----------------------------------------------
+
+    INFERENCE_BACKEND: str = "torch"  # torch | onnxruntime (LayoutLMv3/BERT模型)
+    INFERENCE_QUANTIZE: bool = False  # 动态INT8量化Linear层(仅CPU, torch后端)
+    TORCH_NUM_THREADS: int = 0  # torch推理线程数, 0 使用torch默认值
+    INFERENCE_WARMUP: bool = True  # 启动时以代表性输入执行一次前向推理预热模型
 
     def format_print(self):
         """格式化配置打印."""
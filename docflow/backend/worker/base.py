@@ -11,6 +11,7 @@ import abc
 import json
 import time
 from typing import List
+from typing import Optional
 
 import requests
 from docflow.backend.settings import settings
@@ -25,7 +26,34 @@ from .sync_to_async import sync
 
 
 class ConductorWorker(WorkerInterface):
-    """PredictPythonWorker."""
+    """PredictPythonWorker.
+
+    concurrency: 单进程同时执行的任务数, 默认 settings.CONDUCTOR_WORKER_CONCURRENCY
+    中该任务类型的配置, 未配置时为1
+    replicas: 启动的进程数, 默认 settings.CONDUCTOR_WORKER_REPLICAS
+    中该任务类型的配置, 未配置时为1, 0 表示不启动
+
+    配置保存在实例上, spawn子进程重新导入settings时不受命令行参数影响
+    """
+
+    def __init__(
+        self,
+        task_definition_name: str,
+        concurrency: Optional[int] = None,
+        replicas: Optional[int] = None,
+    ):
+        """初始化函数."""
+        super().__init__(task_definition_name)
+        if concurrency is None:
+            concurrency = settings.CONDUCTOR_WORKER_CONCURRENCY.get(
+                task_definition_name, 1
+            )
+
+        if replicas is None:
+            replicas = settings.CONDUCTOR_WORKER_REPLICAS.get(task_definition_name, 1)
+
+        self.concurrency = concurrency
+        self.replicas = replicas
 
     def async_run(self, async_callback):
         """异步执行."""
@@ -6,56 +6,161 @@
 
 @desc: conductor 工作者
 """
+import glob
 import logging
+import os
 from logging import config
+from typing import Dict
 from typing import List
+from typing import Tuple
 
 import click
 import torch.multiprocessing as mp
 from conductor.client.automator.task_handler import MetricsSettings
 from conductor.client.automator.task_handler import TaskHandler
-from conductor.client.automator.task_handler import TaskRunner
 from conductor.client.configuration.configuration import Configuration
 from conductor.client.worker.worker_interface import WorkerInterface
 
+from ..predict_engine import share_model_memory
 from ..settings import settings
 from .keyinfo_worker import KeyinfoPredictWorker
 from .pdfclasss_worker import PdfclassBertPredictWorker
 from .pdfclasss_worker import PdfclassPredictWorker
 from .pdfside_worker import PdfSidePredictWorker
+from .runner import ConcurrentTaskRunner
 from .table_worker import TableTransformerPredictWorker
 
 LOGGER = logging.getLogger()
 
 
+def clear_ready_files():
+    """清理上次运行遗留的就绪文件."""
+    if not settings.CONDUCTOR_WORKER_READY_DIR:
+        return
+
+    for path in glob.glob(os.path.join(settings.CONDUCTOR_WORKER_READY_DIR, "*.ready")):
+        os.remove(path)
+
+
+def share_model_enabled() -> bool:
+    """是否共享模型权重, onnxruntime 会话无法跨进程共享, 各进程自行加载."""
+    return (
+        settings.CONDUCTOR_WORKER_SHARE_MODEL
+        and settings.INFERENCE_BACKEND != "onnxruntime"
+    )
+
+
+def share_worker_model(worker: WorkerInterface):
+    """父进程加载模型并放入共享内存, spawn子进程序列化时只传递共享内存句柄."""
+    load_module = getattr(worker, "load_module", None)
+    if load_module is None:
+        return
+
+    count = share_model_memory(load_module())
+    LOGGER.info("共享模型权重[%s][%s]", worker.get_task_definition_name(), count)
+
+
 class TorchTaskHandler(TaskHandler):
-    """TorchTaskHandler."""
+    """TorchTaskHandler.
 
-    def __create_task_runner_process(  # pylint: disable=unused-private-member
+    TaskHandler 内部通过 self.__create_task_runner_process 创建进程,
+    需按名称改写后的方法名覆盖, 才能替换为 torch 进程和并发执行器,
+    每个worker按 replicas 启动多个进程
+    """
+
+    def _TaskHandler__create_task_runner_process(
         self,
         worker: WorkerInterface,
         configuration: Configuration,
         metrics_settings: MetricsSettings,
     ) -> None:
-        task_runner = TaskRunner(worker, configuration, metrics_settings)
-        process = mp.Process(target=task_runner.run)
-        self.task_runner_processes.append(process)
+        replicas = getattr(worker, "replicas", 1)
+        if replicas <= 0:
+            return
+
+        if share_model_enabled():
+            share_worker_model(worker)
+
+        for _ in range(replicas):
+            task_runner = ConcurrentTaskRunner(worker, configuration, metrics_settings)
+            process = mp.Process(target=task_runner.run)
+            self.task_runner_processes.append(process)
+
+
+def parse_task_counts(values: Tuple[str, ...]) -> Dict[str, int]:
+    """解析命令行 任务类型=数量 参数."""
+    counts = {}
+    for value in values:
+        name, sep, count = value.rpartition("=")
+        if not sep or not name or not count.isdigit():
+            raise click.BadParameter(f"{value} format error, need name=count")
+        counts[name] = int(count)
+    return counts
 
 
 @click.command()
 @click.option("--logging_conf", default="./logging.conf", help="日志配置")
-def main(logging_conf):
+@click.option(
+    "--replicas",
+    multiple=True,
+    help="任务类型进程数(可重复), 例如 worker_表格识别=2, 0 表示不启动",
+)
+@click.option(
+    "--concurrency",
+    multiple=True,
+    help="任务类型单进程并发任务数(可重复), 例如 worker_表格识别=4",
+)
+def main(logging_conf, replicas, concurrency):
     """主函数."""
     config.fileConfig(logging_conf, disable_existing_loggers=True)
     mp.set_start_method("spawn", force=True)
+    clear_ready_files()
 
-    workers: List[WorkerInterface] = [
-        PdfSidePredictWorker(task_definition_name="worker_图像方向识别"),
-        KeyinfoPredictWorker(task_definition_name="worker_图片关键信息识别"),
-        PdfclassPredictWorker(task_definition_name="worker_图片类型识别"),
-        PdfclassBertPredictWorker(task_definition_name="worker_图片类型识别Bert"),
-        TableTransformerPredictWorker(task_definition_name="worker_表格识别"),
+    if share_model_enabled():
+        # 共享张量数量多, 避免 file_descriptor 策略耗尽文件句柄
+        mp.set_sharing_strategy("file_system")
+    elif settings.CONDUCTOR_WORKER_SHARE_MODEL:
+        LOGGER.warning("onnxruntime 后端不支持共享模型权重")
+
+    replicas_conf = {
+        **settings.CONDUCTOR_WORKER_REPLICAS,
+        **parse_task_counts(replicas),
+    }
+    concurrency_conf = {
+        **settings.CONDUCTOR_WORKER_CONCURRENCY,
+        **parse_task_counts(concurrency),
+    }
+    worker_classes = [
+        (PdfSidePredictWorker, "worker_图像方向识别"),
+        (KeyinfoPredictWorker, "worker_图片关键信息识别"),
+        (PdfclassPredictWorker, "worker_图片类型识别"),
+        (PdfclassBertPredictWorker, "worker_图片类型识别Bert"),
+        (TableTransformerPredictWorker, "worker_表格识别"),
     ]
+    unknown = set(replicas_conf) | set(concurrency_conf)
+    unknown -= {name for _, name in worker_classes}
+    if unknown:
+        raise click.BadParameter(f"unknown task type {sorted(unknown)}")
+
+    workers: List[WorkerInterface] = []
+    for worker_cls, name in worker_classes:
+        worker = worker_cls(
+            task_definition_name=name,
+            concurrency=concurrency_conf.get(name, 1),
+            replicas=replicas_conf.get(name, 1),
+        )
+        if worker.replicas <= 0:
+            LOGGER.info("worker disabled %s", name)
+            continue
+
+        LOGGER.info(
+            "worker %s replicas %s concurrency %s",
+            name,
+            worker.replicas,
+            worker.concurrency,
+        )
+        workers.append(worker)
+
     capi = settings.CONDUCTOR_API
     if capi.endswith("/"):
         capi = capi[:-1]
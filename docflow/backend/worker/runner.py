@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 16:42:08.
+
+@author: ppolxda
+
+@desc: conductor 并发任务执行器
+"""
+
+import logging
+import os
+import queue
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from dataclasses import dataclass
+from typing import List
+from typing import Optional
+from typing import Set
+
+from conductor.client.automator.task_runner import TaskRunner
+from conductor.client.configuration.configuration import Configuration
+from conductor.client.configuration.settings.metrics_settings import MetricsSettings
+from conductor.client.http.models.task import Task
+from conductor.client.http.models.task_exec_log import TaskExecLog
+from conductor.client.http.models.task_result import TaskResult
+from conductor.client.worker.worker_interface import WorkerInterface
+
+from ..google_ocr import api as ocr_api
+from ..predict_engine import warmup_predictor
+from ..predict_utils import close_clients
+from ..settings import settings
+from .sync_to_async import get_loop
+from .sync_to_async import sync
+
+LOGGER = logging.getLogger()
+
+
+@dataclass
+class PendingResult(object):
+    """待回写的任务结果."""
+
+    task_result: TaskResult
+    attempt: int = 0
+    retry_at: float = 0.0
+
+
+class ConcurrentTaskRunner(TaskRunner):
+    """并发任务执行器.
+
+    按空闲槽位批量拉取任务, 每个任务在线程池中执行 worker.execute,
+    任务的IO阶段在后台事件循环上并发执行, 模型前向推理由 InferenceEngine 串行执行,
+    同时执行的任务数由 worker.concurrency 限制
+
+    拉取间隔自适应: 拉满一批时立即继续拉取, 队列为空时从
+    CONDUCTOR_WORKER_INTERVAL 开始倍增退避至 CONDUCTOR_WORKER_MAX_INTERVAL;
+    任务结果由执行线程放入队列, 主循环每轮统一回写
+    """
+
+    MAX_UPDATE_RETRY = 4
+
+    def __init__(
+        self,
+        worker: WorkerInterface,
+        configuration: Optional[Configuration] = None,
+        metrics_settings: Optional[MetricsSettings] = None,
+        batch_size: Optional[int] = None,
+        max_interval: Optional[float] = None,
+    ):
+        """初始化函数."""
+        super().__init__(worker, configuration, metrics_settings)
+        if batch_size is None:
+            batch_size = settings.CONDUCTOR_WORKER_BATCH_SIZE
+
+        if max_interval is None:
+            max_interval = settings.CONDUCTOR_WORKER_MAX_INTERVAL
+
+        self.concurrency = max(int(getattr(worker, "concurrency", 1)), 1)
+        self.batch_size = batch_size
+        self.max_interval = max_interval
+        self.interval = worker.get_polling_interval_in_seconds()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.results: Optional["queue.Queue[PendingResult]"] = None
+        self.running: Set[Future] = set()
+
+    def run(self) -> None:
+        """主循环."""
+        if self.configuration is not None:
+            self.configuration.apply_logging_config()
+
+        # 线程池和队列不可序列化, 在子进程中创建
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix=self.worker.get_task_definition_name(),
+        )
+        self.results = queue.Queue()
+
+        # 多线程执行前加载并预热模型, 避免并发重复加载和首个任务超时
+        # 预热失败时不写入就绪文件, 退出进程由 TaskHandler 重启
+        load_module = getattr(self.worker, "load_module", None)
+        name = self.worker.get_task_definition_name()
+        if load_module is not None and not warmup_predictor(load_module(), name):
+            LOGGER.error("worker warmup failed %s", name)
+            sys.exit(1)
+
+        # TaskHandler 通过 SIGTERM 结束子进程, 转为 SystemExit 以执行清理
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        self.write_ready_file()
+        try:
+            while True:
+                try:
+                    self.run_once()
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.warning("任务循环异常 %s", traceback.format_exc())
+        finally:
+            self.drain()
+            self.close_clients()
+            self.remove_ready_file()
+
+    def drain(self):
+        """退出前停止拉取, 等待执行中的任务完成并回写全部结果.
+
+        最多等待 CONDUCTOR_WORKER_DRAIN_TIMEOUT 秒, 超时未回写的任务由 conductor 超时重试
+        """
+        if self.executor is None or self.results is None:
+            return
+
+        deadline = time.time() + settings.CONDUCTOR_WORKER_DRAIN_TIMEOUT
+        self.executor.shutdown(wait=False)
+        wait(self.running, timeout=max(deadline - time.time(), 0))
+        while True:
+            self.flush_results()
+            if self.results.empty() or time.time() >= deadline:
+                break
+            time.sleep(1)
+
+        pending = self.results.qsize() + len([i for i in self.running if not i.done()])
+        if pending:
+            LOGGER.error("退出前未回写任务结果[%s]", pending)
+
+    @staticmethod
+    def close_clients():
+        """关闭后台事件循环上的OCR、下载和S3长连接."""
+
+        async def close():
+            """关闭当前事件循环的长连接."""
+            await ocr_api.close()
+            await close_clients()
+
+        try:
+            sync(get_loop(), close(), timeout=10)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOGGER.warning("关闭长连接失败[%s]", ex)
+
+    @staticmethod
+    def ready_file_path(task_definition_name: str, pid: int) -> str:
+        """就绪文件路径."""
+        return os.path.join(
+            settings.CONDUCTOR_WORKER_READY_DIR, f"{task_definition_name}.{pid}.ready"
+        )
+
+    def write_ready_file(self):
+        """模型预热完成, 开始拉取任务前写入就绪文件."""
+        if not settings.CONDUCTOR_WORKER_READY_DIR:
+            return
+
+        os.makedirs(settings.CONDUCTOR_WORKER_READY_DIR, exist_ok=True)
+        path = self.ready_file_path(self.worker.get_task_definition_name(), os.getpid())
+        with open(path, "w", encoding="utf8") as fs:
+            fs.write(str(time.time()))
+        LOGGER.info("worker ready %s", path)
+
+    def remove_ready_file(self):
+        """进程退出时删除就绪文件."""
+        if not settings.CONDUCTOR_WORKER_READY_DIR:
+            return
+
+        path = self.ready_file_path(self.worker.get_task_definition_name(), os.getpid())
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def run_once(self) -> None:
+        """回写结果, 拉取并提交一批任务."""
+        assert self.executor is not None
+        self.flush_results()
+
+        self.running = {i for i in self.running if not i.done()}
+        free = self.concurrency - len(self.running)
+        requested = 0
+        polled = 0
+        if free > 0:
+            requested = min(free, self.batch_size) if self.batch_size > 0 else free
+            tasks = self.poll_tasks(requested)
+            polled = len(tasks)
+            for task in tasks:
+                self.running.add(self.executor.submit(self.execute_and_update, task))
+
+        self.adapt_interval(requested, polled)
+
+        # 拉满一批且仍有空闲槽位, 说明队列中还有任务, 立即继续拉取
+        if polled and polled >= requested and free > polled:
+            return
+
+        # 等待拉取间隔, 期间有任务完成时提前唤醒回写结果
+        if self.running:
+            wait(self.running, timeout=self.interval, return_when=FIRST_COMPLETED)
+        else:
+            time.sleep(self.interval)
+
+    def adapt_interval(self, requested: int, polled: int):
+        """根据拉取结果调整拉取间隔."""
+        if not requested:
+            return
+
+        base = self.worker.get_polling_interval_in_seconds()
+        if polled:
+            self.interval = base
+        else:
+            self.interval = min(max(self.interval * 2, base), self.max_interval)
+
+    def poll_tasks(self, count: int) -> List[Task]:
+        """批量拉取任务."""
+        task_definition_name = self.worker.get_task_definition_name()
+        if self.worker.paused():
+            LOGGER.warning("Stop polling task for: %s", task_definition_name)
+            return []
+
+        if self.metrics_collector is not None:
+            self.metrics_collector.increment_task_poll(task_definition_name)
+
+        try:
+            start_time = time.time()
+            params = {"workerid": self.worker.get_identity(), "count": count}
+            domain = self.worker.get_domain()
+            if domain is not None:
+                params["domain"] = domain
+
+            tasks = self.task_client.batch_poll(tasktype=task_definition_name, **params)
+            if self.metrics_collector is not None:
+                self.metrics_collector.record_task_poll_time(
+                    task_definition_name, time.time() - start_time
+                )
+        except Exception as ex:  # pylint: disable=broad-except
+            if self.metrics_collector is not None:
+                self.metrics_collector.increment_task_poll_error(
+                    task_definition_name, type(ex)
+                )
+            LOGGER.debug(
+                "Failed to poll task for: %s, reason: %s",
+                task_definition_name,
+                traceback.format_exc(),
+            )
+            return []
+
+        return [i for i in tasks or [] if i is not None and i.task_id is not None]
+
+    def execute_and_update(self, task: Task):
+        """执行任务, 结果放入回写队列."""
+        assert self.results is not None
+        task_result = self.execute_task(task)
+        self.results.put(PendingResult(task_result))
+
+    def execute_task(self, task: Task) -> TaskResult:
+        """执行任务."""
+        task_definition_name = self.worker.get_task_definition_name()
+        try:
+            start_time = time.time()
+            task_result = self.worker.execute(task)
+            if self.metrics_collector is not None:
+                self.metrics_collector.record_task_execute_time(
+                    task_definition_name, time.time() - start_time
+                )
+                self.metrics_collector.record_task_result_payload_size(
+                    task_definition_name, sys.getsizeof(task_result)
+                )
+        except Exception as ex:  # pylint: disable=broad-except
+            if self.metrics_collector is not None:
+                self.metrics_collector.increment_task_execution_error(
+                    task_definition_name, type(ex)
+                )
+            task_result = TaskResult(
+                task_id=task.task_id,
+                workflow_instance_id=task.workflow_instance_id,
+                worker_id=self.worker.get_identity(),
+            )
+            task_result.status = "FAILED"
+            task_result.reason_for_incompletion = str(ex)
+            task_result.logs = [
+                TaskExecLog(traceback.format_exc(), task.task_id, int(time.time()))
+            ]
+            LOGGER.error(
+                "Failed to execute task, id: %s, reason: %s",
+                task.task_id,
+                traceback.format_exc(),
+            )
+        return task_result
+
+    def flush_results(self):
+        """批量回写已完成任务结果, 失败时延时重试."""
+        assert self.results is not None
+        now = time.time()
+        retries: List[PendingResult] = []
+        while True:
+            try:
+                pending = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if pending.retry_at > now or not self.update_task(pending.task_result):
+                retries.append(pending)
+
+        for pending in retries:
+            if pending.retry_at <= now:
+                pending.attempt += 1
+                if pending.attempt >= self.MAX_UPDATE_RETRY:
+                    LOGGER.error("回写任务结果失败 %s", pending.task_result.task_id)
+                    continue
+                pending.retry_at = now + pending.attempt * 10
+            self.results.put(pending)
+
+    def update_task(self, task_result: TaskResult) -> bool:
+        """回写任务结果."""
+        task_definition_name = self.worker.get_task_definition_name()
+        try:
+            self.task_client.update_task(body=task_result)
+        except Exception as ex:  # pylint: disable=broad-except
+            if self.metrics_collector is not None:
+                self.metrics_collector.increment_task_update_error(
+                    task_definition_name, type(ex)
+                )
+            LOGGER.debug(
+                "Failed to update task, id: %s, reason: %s",
+                task_result.task_id,
+                traceback.format_exc(),
+            )
+            return False
+        return True
@@ -13,7 +13,7 @@ from typing import List
 from docflow.backend.predict_table.table_transformer import TableTransformerDetection
 from docflow.backend.predict_table.table_transformer import TableTransformerStructure
 from docflow.backend.predict_table.tables import TableStructurePredict
-from docflow.backend.predict_utils import download_image
+from docflow.backend.predict_utils import download_image_data
 from conductor.client.http.models.task_exec_log import TaskExecLog
 from conductor.client.worker.worker import Task
 from conductor.client.worker.worker import TaskResult
@@ -69,6 +69,6 @@ class TableTransformerPredictWorker(ConductorWorker):
     async def predict(self, url: str, ocr_s3: str):
         """请求模型推理."""
         cli = self.load_module()
-        image = await download_image(url)
+        image = await download_image_data(url)
         tables = await cli.predict(image, ocr_s3, fix_table_boxs=True)
         return [i.dict() for i in tables]
@@ -31,6 +31,7 @@ from .s3.s3_client import S3Client
 from .settings import settings
 from .utils.amqp_client import AMQPAynscTaskHandler
 from .utils.amqp_client import AMQPHandler
+from .utils.download import DownloadSession
 from .utils.fileutils import is_image
 from .utils.fileutils import is_json
 from .utils.fileutils import is_pdf
@@ -175,6 +176,8 @@ def get_s3_remote_cli() -> S3Client:
         settings.S3_REMOTE_URI,
         bucket_name=settings.S3_BUCKET,
         presign_expire=settings.S3_SIGN_EXPIRE,
+        max_connections=settings.S3_MAX_CONNECTIONS,
+        put_concurrency=settings.S3_PUT_CONCURRENCY,
     )
 
 
@@ -185,6 +188,8 @@ def get_s3_local_cli() -> S3Client:
         settings.S3_LOCAL_URI,
         bucket_name=settings.S3_BUCKET,
         presign_expire=settings.S3_SIGN_EXPIRE,
+        max_connections=settings.S3_MAX_CONNECTIONS,
+        put_concurrency=settings.S3_PUT_CONCURRENCY,
     )
     return cli
 
@@ -198,15 +203,33 @@ def is_vaild_download_url(url: str) -> bool:
     )
 
 
+def local_s3_client():
+    """本地minio客户端上下文."""
+    return get_s3_local_cli().s3cli.create_client()
+
+
+downloader = DownloadSession(
+    settings.DOWNLOAD_POOL_SIZE,
+    settings.DOWNLOAD_POOL_PER_HOST,
+    s3_client=local_s3_client,
+    error=DownloadFailedException,
+)
+
+
+async def close_clients():
+    """关闭当前事件循环的下载会话和S3长连接客户端, 由应用 shutdown 事件调用."""
+    await downloader.close()
+    await get_s3_local_cli().shutdown()
+    await get_s3_remote_cli().shutdown()
+
+
 async def download_file(url: str, timeout: Optional[int] = None) -> bytes:
     """获取文件路径."""
     if not timeout:
         timeout = settings.DOWNLOAD_TIMEOUT
 
-    # 签名重新下载
     if url.startswith("s3://"):
-        cli = get_s3_local_cli()
-        url = await cli.s3cli.presigned_get_s3(url)
+        return await downloader.get_s3(url, timeout)
 
     if not is_vaild_download_url(url):
         raise DownloadFailedException
@@ -217,17 +240,10 @@ async def download_file(url: str, timeout: Optional[int] = None) -> bytes:
             data = fss.read()
             return data
     elif url.startswith("http://") or url.startswith("https://"):
-        ttt = aiohttp.ClientTimeout(total=timeout)  # type: ignore
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=ttt) as rrr:
-                data = await rrr.read()
+        return await downloader.get(url, timeout)
     else:
         raise TypeError("url invaild")
 
-    if b"NoSuchKey" in data or b"<Error>" in data:
-        raise DownloadFailedException
-    return data
-
 
 async def download_file_save(
     session,
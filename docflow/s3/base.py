@@ -6,18 +6,26 @@
 
 @desc: s3接口
 """
+import asyncio
 import contextlib
 import json
 import logging
+import mmap
 import os
 from dataclasses import dataclass
 from datetime import timedelta
+from hashlib import md5
 from io import BytesIO
 from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
 from typing import Dict
 from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
 from typing import Union
 from urllib.parse import urlparse
 
@@ -27,10 +35,14 @@ from botocore.exceptions import ClientError
 from PIL import Image
 
 from ..utils.fileutils import bytes_to_image
-from ..utils.fileutils import image_to_bytes
+from ..utils.images import ImageData
+from ..utils.loops import LoopClient
+from ..utils.loops import release_s3_client
 
 DEFAULT_PUT_EXPIRES = timedelta(days=7)
 DEFAULT_GET_EXPIRES = timedelta(days=7)
+DEFAULT_PUT_CONCURRENCY = 8
+DEFAULT_PART_SIZE = 10 * 1024 * 1024
 
 LOGGER = logging.getLogger()
 
@@ -44,7 +56,10 @@ def hook_not_such_key():
                 return await func(*args, **kwargs)
             except ClientError as ex:
                 assert isinstance(ex.response, dict)
-                if ex.response.get("Error", {}).get("Code", "") in ["404"]:
+                if ex.response.get("Error", {}).get("Code", "") in [
+                    "404",
+                    "NoSuchKey",
+                ]:
                     return None
                 raise ex
 
@@ -53,6 +68,59 @@ def hook_not_such_key():
     return wrapper
 
 
+class MultiPutError(Exception):
+    """批量上传部分失败.
+
+    errors: 上传失败的 s3_key 及异常
+    results: 上传成功的 s3_key 及返回值
+    """
+
+    def __init__(self, errors: Dict[str, BaseException], results: Dict[str, Any]):
+        """初始化函数."""
+        self.errors = errors
+        self.results = results
+        super().__init__(
+            f"multi put failed {len(errors)}/{len(errors) + len(results)}, "
+            f"{list(errors.keys())}"
+        )
+
+
+async def gather_put(
+    datas: List[Union["PutData", "PutDataImage"]],
+    put: Callable[[Union["PutData", "PutDataImage"]], Awaitable[Any]],
+    concurrency: int,
+) -> List[Any]:
+    """限制并发数批量上传, 全部完成后汇总失败对象."""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def put_one(data):
+        async with semaphore:
+            return await put(data)
+
+    results = await asyncio.gather(*[put_one(i) for i in datas], return_exceptions=True)
+
+    errors = {
+        i.obj.s3_key: r for i, r in zip(datas, results) if isinstance(r, BaseException)
+    }
+    if errors:
+        LOGGER.warning("批量上传失败[%s/%s]", len(errors), len(datas))
+        raise MultiPutError(
+            errors,
+            {
+                i.obj.s3_key: r
+                for i, r in zip(datas, results)
+                if not isinstance(r, BaseException)
+            },
+        )
+    return results
+
+
+def encode_png(image: ImageData) -> Tuple[bytes, str]:
+    """PNG编码(原始数据为PNG时直接复用), 并计算内容哈希."""
+    data = image.to_png()
+    return data, md5(data).hexdigest()
+
+
 def parse_s3_key(s3_key):
     """解析一个S3连接."""
     if not s3_key.startswith("s3://") or "/" not in s3_key:
@@ -86,7 +154,7 @@ class PutDataImage(object):
     """PutData."""
 
     obj: "S3ObjectImage"
-    data: Union[bytes, BytesIO, Image.Image]
+    data: Union[bytes, BytesIO, Image.Image, ImageData]
 
 
 @dataclass
@@ -102,7 +170,11 @@ class ImageObject:
 
 
 class S3Session:
-    """S3Session."""
+    """S3Session.
+
+    每个事件循环持有一个长连接客户端, 连接池大小由 max_pool_connections 限制,
+    由 startup / shutdown 管理生命周期, 未显式启动时首次使用自动创建
+    """
 
     def __init__(
         self,
@@ -110,27 +182,42 @@ class S3Session:
         aws_access_key_id,
         aws_secret_access_key,
         region_name="us-east-1",
+        max_pool_connections: int = 10,
     ) -> None:
         """初始化函数."""
         self.endpoint_url = endpoint_url
         self.aws_access_key_id = aws_access_key_id
         self.aws_secret_access_key = aws_secret_access_key
         self.region_name = region_name
-        self.config = AioConfig(signature_version="s3v4")
+        self.config = AioConfig(
+            signature_version="s3v4", max_pool_connections=max_pool_connections
+        )
+        self.session = aioboto3.Session()
+        self.clients = LoopClient(self.create_client, release_s3_client)
 
-    @contextlib.asynccontextmanager
-    async def client(self):
-        """创建客户端."""
-        session = aioboto3.Session()
-        async with session.client(
+    def create_client(self):
+        """创建新的客户端上下文."""
+        return self.session.client(
             "s3",
             region_name=self.region_name,
             endpoint_url=self.endpoint_url,
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
             config=self.config,
-        ) as s3cli:
-            yield s3cli
+        )
+
+    async def startup(self):
+        """启动当前事件循环的长连接客户端."""
+        return await self.clients.get()
+
+    async def shutdown(self):
+        """关闭当前事件循环的长连接客户端."""
+        await self.clients.close()
+
+    @contextlib.asynccontextmanager
+    async def client(self):
+        """获取客户端."""
+        yield await self.startup()
 
 
 class S3Object(object):
@@ -166,53 +253,90 @@ class S3Object(object):
     async def put_s3_block(
         self,
         file_path: str = "",
+        content_type="application/octet-stream",
+        part_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
     ):
-        """分块上传文件."""
+        """分块上传文件.
+
+        文件只打开一次并通过mmap按块读取, 最多 concurrency 个分块同时上传,
+        内存占用约为 concurrency * part_size, 失败时中止分块上传并抛出异常
+        """
         bucket, object_id = parse_s3_key(self.s3_key)
 
-        chunk_size = 10 * 1024 * 1024
+        if part_size is None:
+            part_size = DEFAULT_PART_SIZE
+
+        if concurrency is None:
+            concurrency = self.s3cli.put_concurrency
+
         file_size = os.path.getsize(file_path)
         LOGGER.info(f"文件大小{file_size}")
 
-        async with self.s3cli.create_client() as s3cli:
-            r = await s3cli.create_multipart_upload(Bucket=bucket, Key=object_id)
-            upload_id = r["UploadId"]
-
-            try:
-                part_number = 1
-                offset = 0
-                parts = []
-                while offset < file_size:
-                    # 读取块数据
-                    with open(file_path, "rb") as file:
-                        file.seek(offset)
-                        data = file.read(chunk_size)
-
-                    # 上传块
-                    response = await s3cli.upload_part(
+        # 小文件无需分块
+        if file_size <= part_size:
+            with open(file_path, "rb") as file:
+                data = file.read()
+            return await self.put_s3(data, content_type=content_type)
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        with open(file_path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            async with self.s3cli.create_client() as s3cli:
+                r = await s3cli.create_multipart_upload(
+                    Bucket=bucket, Key=object_id, ContentType=content_type
+                )
+                upload_id = r["UploadId"]
+
+                async def upload_part(part_number: int, offset: int):
+                    async with semaphore:
+                        data = await loop.run_in_executor(
+                            None, mm.__getitem__, slice(offset, offset + part_size)
+                        )
+                        response = await s3cli.upload_part(
+                            Bucket=bucket,
+                            Key=object_id,
+                            PartNumber=part_number,
+                            UploadId=upload_id,
+                            Body=data,
+                        )
+                        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+                tasks = [
+                    asyncio.ensure_future(upload_part(i + 1, offset))
+                    for i, offset in enumerate(range(0, file_size, part_size))
+                ]
+                try:
+                    parts = await asyncio.gather(*tasks)
+                    r = await s3cli.complete_multipart_upload(
                         Bucket=bucket,
                         Key=object_id,
-                        PartNumber=part_number,
                         UploadId=upload_id,
-                        Body=data,
+                        MultipartUpload={"Parts": parts},
                     )
-                    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
-                    part_number += 1
-                    offset += len(data)
-
-                await s3cli.complete_multipart_upload(
-                    Bucket=bucket,
-                    Key=object_id,
-                    UploadId=upload_id,
-                    MultipartUpload={"Parts": parts},
-                )
+                except BaseException as ex:
+                    LOGGER.warning("分块上传失败[%s]%s", ex, self.s3_key)
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    # 中止失败只记录日志, 保留原始异常
+                    try:
+                        await s3cli.abort_multipart_upload(
+                            Bucket=bucket, Key=object_id, UploadId=upload_id
+                        )
+                    except Exception as abort_ex:  # pylint: disable=broad-except
+                        LOGGER.warning(
+                            "中止分块上传失败[%s]%s %s",
+                            abort_ex,
+                            self.s3_key,
+                            upload_id,
+                        )
+                    raise
 
                 LOGGER.info("Upload complete.")
-            except Exception as e:
-                LOGGER.info("Error: " + str(e))
-                await s3cli.abort_multipart_upload(
-                    Bucket=bucket, Key=object_id, UploadId=upload_id
-                )
+                return r
 
     @hook_not_such_key()
     async def get_s3(self) -> bytes:
@@ -336,19 +460,26 @@ class S3ObjectJson(S3Object):
 class S3ObjectImage(S3Object):
     """S3ObjectJson."""
 
-    async def put_image_s3(self, image_data: Union[bytes, BytesIO, Image.Image]):
+    async def put_image_s3(
+        self, image_data: Union[bytes, BytesIO, Image.Image, ImageData]
+    ):
         """缩略图生成保存."""
-        if isinstance(image_data, BytesIO):
-            _image = bytes_to_image(image_data)
-        elif isinstance(image_data, Image.Image):
-            _image = image_data
-        else:
-            _image = bytes_to_image(image_data)
+        r, _ = await self.put_image_info_s3(image_data)
+        return r
 
-        _height = _image.height
-        _width = _image.width
+    async def put_image_info_s3(
+        self, image_data: Union[bytes, BytesIO, Image.Image, ImageData]
+    ) -> Tuple[dict, Dict[str, Any]]:
+        """保存图片, 并返回图片清单信息(键值, 大小, 宽高, 哈希).
 
-        _data = image_to_bytes(_image)
+        PNG数据直接上传, 不再解码后重新编码
+        """
+        _image = ImageData.from_any(image_data)
+
+        # PNG编码耗CPU, 放到线程池执行, 避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        _data, _hash = await loop.run_in_executor(None, encode_png, _image)
+        _width, _height = _image.size
         r = await self.put_s3(
             _data,
             content_type="image/png",
@@ -357,7 +488,15 @@ class S3ObjectImage(S3Object):
                 "width": str(_width),
             },
         )
-        return r
+
+        _, object_id = parse_s3_key(self.s3_key)
+        return r, {
+            "key": object_id.lstrip("/"),
+            "size": len(_data),
+            "width": _width,
+            "height": _height,
+            "hash": _hash,
+        }
 
     async def get_image_s3(self, defval=None):
         """获取数据."""
@@ -382,30 +521,20 @@ class S3ObjectPath(object):
         self.s3cli = s3cli
         self.s3_key = s3_key
 
-    async def delete_dir_s3(self, limit=100):
-        """删除整个目录."""
+    async def delete_dir_s3(
+        self,
+        dry_run: bool = False,
+        concurrency: Optional[int] = None,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> int:
+        """删除整个目录, 返回删除(dry_run时为待删除)对象数量."""
         bucket, object_id = parse_s3_key(self.s3_key)
-        async with self.s3cli.create_client() as s3cli:
-            objs = await s3cli.list_objects_v2(Bucket=bucket, Prefix=object_id)
-            if not objs.get("Contents", []):
-                return
-
-            if len(objs["Contents"]) > limit:
-                raise TypeError("delete to many")
+        if object_id.startswith("/"):
+            object_id = object_id[1:]
 
-            response = await s3cli.delete_objects(
-                Bucket=bucket,
-                Delete={
-                    "Objects": [
-                        {
-                            "Key": i["Key"],
-                        }
-                        for i in objs["Contents"]
-                    ],
-                    "Quiet": True,
-                },
-            )
-            return response
+        return await self.s3cli.delete_prefix(
+            bucket, object_id + "/", dry_run, concurrency, progress
+        )
 
     def create_object_s3(self, object_id: str):
         """创建上传对象."""
@@ -422,35 +551,56 @@ class S3ObjectPath(object):
         return PutData(obj=obj, data=data)
 
     async def list_objects_s3(self):
-        """获取对象列表."""
+        """获取对象列表, 按分页遍历全部对象."""
         bucket, object_id = parse_s3_key(self.s3_key)
         async with self.s3cli.create_client() as s3cli:
             if object_id.startswith("/"):
                 object_id = object_id[1:]
 
-            objs = await s3cli.list_objects_v2(Bucket=bucket, Prefix=object_id)
-            if not objs.get("Contents", []):
-                return
+            paginator = s3cli.get_paginator("list_objects_v2")
+            async for objs in paginator.paginate(Bucket=bucket, Prefix=object_id):
+                for i in objs.get("Contents", []):
+                    yield bucket, i
 
-            for i in objs["Contents"]:
-                yield bucket, i
+    async def multi_put_s3(
+        self,
+        datas: Union[List[PutData], Iterator[PutData]],
+        concurrency: Optional[int] = None,
+    ):
+        """上传PDF图片缓存.
 
-    async def multi_put_s3(self, datas: Union[List[PutData], Iterator[PutData]]):
-        """上传PDF图片缓存."""
+        concurrency: 最大并发上传数, 默认 S3Client.put_concurrency
+        部分上传失败时抛出 MultiPutError
+        """
         await self.delete_dir_s3()
 
+        datas = list(datas)
         if not datas:
             return
 
-        return [await i.obj.put_s3(i.data) for i in datas]
+        if concurrency is None:
+            concurrency = self.s3cli.put_concurrency
+
+        return await gather_put(datas, lambda i: i.obj.put_s3(i.data), concurrency)
 
 
 class S3ObjectPathImage(S3ObjectPath):
     """S3ObjectPathImage.
 
     目录暂时只考虑一层目录
+    批量上传时在目录下写入 manifest.json 图片清单, 读取时一次GET获取全部页信息
     """
 
+    MANIFEST_NAME = "manifest.json"
+
+    def create_manifest_s3(self) -> S3ObjectJson:
+        """图片清单对象."""
+        return S3ObjectJson(self.s3cli, "/".join([self.s3_key, self.MANIFEST_NAME]))
+
+    async def load_manifest_s3(self) -> Optional[Dict[str, Any]]:
+        """读取图片清单, 不存在时返回None."""
+        return await self.create_manifest_s3().get_json_s3()
+
     def create_image_s3(self, object_id: str) -> S3ObjectImage:
         """创建上传对象."""
         if object_id.endswith("/"):
@@ -460,57 +610,131 @@ class S3ObjectPathImage(S3ObjectPath):
         return S3ObjectImage(self.s3cli, s3_key)
 
     def create_putdata_image_s3(
-        self, object_id: str, data: Union[bytes, BytesIO, Image.Image]
+        self, object_id: str, data: Union[bytes, BytesIO, Image.Image, ImageData]
     ) -> PutDataImage:
         """创建上传对象."""
         assert object_id and data
         obj = self.create_image_s3(object_id)
         return PutDataImage(obj=obj, data=data)
 
-    async def list_images_s3(self, expires: Optional[int] = None):
-        """删除源图缓存集合."""
+    async def list_images_s3(
+        self,
+        expires: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[ImageObject]:
+        """源图缓存集合.
+
+        同一客户端本地签名, 每 page_size 个对象并发获取宽高, 按列表顺序返回
+        """
         if expires is None:
             expires = int(DEFAULT_GET_EXPIRES.total_seconds())
 
-        expires_ = timedelta(seconds=float(expires))
-
-        async for bucket, x in self.list_objects_s3():
-            key = x.get("Key", "")
-            if not key:
-                continue
-
-            s3_key = make_s3_key(bucket, key)
-            s3_obj = self.s3cli.create_s3_image(s3_key)
-
-            # 切换后性能低，需要提供
-            url = await s3_obj.presigned_get_s3(expires_)
-            metadata = await s3_obj.get_stat_s3()
-
-            yield ImageObject(
-                **{
-                    "file_name": os.path.basename(key),
-                    "object_name": key,
-                    "object_url": url,
-                    "s3_key": make_s3_key(self.s3cli.bucket, key),
-                    "height": int(metadata.get("X-Amz-Meta-Height", 0))
-                    if metadata
-                    else 0,
-                    "width": int(metadata.get("X-Amz-Meta-Width", 0))
-                    if metadata
-                    else 0,
-                }
-            )
+        if concurrency is None:
+            concurrency = self.s3cli.put_concurrency
+
+        manifest = await self.load_manifest_s3()
+        if manifest:
+            bucket, _ = parse_s3_key(self.s3_key)
+            async with self.s3cli.create_client() as s3cli:
+                for page in manifest["pages"]:
+                    url = await s3cli.generate_presigned_url(
+                        ClientMethod="get_object",
+                        Params={"Bucket": bucket, "Key": page["key"]},
+                        ExpiresIn=expires,
+                    )
+                    yield ImageObject(
+                        **{
+                            "file_name": os.path.basename(page["key"]),
+                            "object_name": page["key"],
+                            "object_url": url,
+                            "s3_key": make_s3_key(self.s3cli.bucket, page["key"]),
+                            "height": page["height"],
+                            "width": page["width"],
+                        }
+                    )
+            return
+
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        async with self.s3cli.create_client() as s3cli:
+
+            async def make_image_object(bucket: str, key: str):
+                url = await s3cli.generate_presigned_url(
+                    ClientMethod="get_object",
+                    Params={"Bucket": bucket, "Key": key},
+                    ExpiresIn=expires,
+                )
+                async with semaphore:
+                    try:
+                        r = await s3cli.head_object(Bucket=bucket, Key=key)
+                        metadata = r["Metadata"]
+                    except ClientError as ex:
+                        assert isinstance(ex.response, dict)
+                        if ex.response.get("Error", {}).get("Code", "") not in ["404"]:
+                            raise ex
+                        metadata = {}
+
+                return ImageObject(
+                    **{
+                        "file_name": os.path.basename(key),
+                        "object_name": key,
+                        "object_url": url,
+                        "s3_key": make_s3_key(self.s3cli.bucket, key),
+                        "height": int(metadata.get("height", 0)),
+                        "width": int(metadata.get("width", 0)),
+                    }
+                )
+
+            batch = []
+            async for bucket, x in self.list_objects_s3():
+                key = x.get("Key", "")
+                if not key or os.path.basename(key) == self.MANIFEST_NAME:
+                    continue
+
+                batch.append(make_image_object(bucket, key))
+                if len(batch) >= page_size:
+                    for i in await asyncio.gather(*batch):
+                        yield i
+                    batch = []
+
+            for i in await asyncio.gather(*batch):
+                yield i
 
     async def multi_put_images_s3(
-        self, datas: Union[List[PutDataImage], Iterator[PutDataImage]]
+        self,
+        datas: Union[List[PutDataImage], Iterator[PutDataImage]],
+        concurrency: Optional[int] = None,
     ):
-        """上传PDF图片缓存."""
+        """上传PDF图片缓存.
+
+        concurrency: 最大并发上传数, 默认 S3Client.put_concurrency
+        部分上传失败时抛出 MultiPutError, 且不写入图片清单
+        """
         await self.delete_dir_s3()
 
+        datas = list(datas)
         if not datas:
             return
 
-        return [await i.obj.put_image_s3(i.data) for i in datas]
+        if concurrency is None:
+            concurrency = self.s3cli.put_concurrency
+
+        pages: Dict[str, Dict[str, Any]] = {}
+
+        async def put_page(data: PutDataImage):
+            r, pages[data.obj.s3_key] = await data.obj.put_image_info_s3(data.data)
+            return r
+
+        results = await gather_put(datas, put_page, concurrency)
+        await self.create_manifest_s3().put_json_s3(
+            {
+                "pages": [
+                    {"page": i, **pages[data.obj.s3_key]}
+                    for i, data in enumerate(datas)
+                ]
+            }
+        )
+        return results
 
 
 class S3BizClient(object):
@@ -545,15 +769,100 @@ class S3Client(object):
         self,
         client: S3Session,
         bucket: Optional[str] = None,
+        put_concurrency: Optional[int] = None,
     ):
         """初始化函数."""
         if bucket is None:
             bucket = "pdfocr"
 
+        if put_concurrency is None:
+            put_concurrency = DEFAULT_PUT_CONCURRENCY
+
         self.client = client
         self.bucket = bucket
+        self.put_concurrency = put_concurrency
         self.create_client = self.client.client
 
+    async def delete_prefix(
+        self,
+        bucket: str,
+        prefix: str = "",
+        dry_run: bool = False,
+        concurrency: Optional[int] = None,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> int:
+        """按前缀删除对象.
+
+        分页遍历全部对象, 每页(最多1000个键值)一个 delete_objects 批次并发删除,
+        dry_run 只统计数量不删除, progress 每完成一个批次回调一次已删除数量
+        """
+        if concurrency is None:
+            concurrency = self.put_concurrency
+
+        count = 0
+        deleted = 0
+        errors: List[dict] = []
+
+        async with self.create_client() as s3cli:
+
+            async def delete_batch(keys: List[dict]):
+                nonlocal deleted
+                r = await s3cli.delete_objects(
+                    Bucket=bucket,
+                    Delete={"Objects": keys, "Quiet": True},
+                )
+
+                errors.extend(r.get("Errors", []))
+                deleted += len(keys) - len(r.get("Errors", []))
+                LOGGER.info("删除对象[%s]%s/%s", bucket, deleted, count)
+                if progress is not None:
+                    progress(deleted)
+
+            # 边遍历边删除, 最多 concurrency 个批次同时进行
+            pending: Set[asyncio.Future] = set()
+            try:
+                paginator = s3cli.get_paginator("list_objects_v2")
+                async for objs in paginator.paginate(
+                    Bucket=bucket, Prefix=prefix, PaginationConfig={"PageSize": 1000}
+                ):
+                    keys = [{"Key": i["Key"]} for i in objs.get("Contents", [])]
+                    if not keys:
+                        continue
+
+                    count += len(keys)
+                    if dry_run:
+                        continue
+
+                    if len(pending) >= max(concurrency, 1):
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            task.result()
+
+                    pending.add(asyncio.ensure_future(delete_batch(keys)))
+
+                if pending:
+                    await asyncio.gather(*pending)
+            except BaseException:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                raise
+
+        if errors:
+            LOGGER.warning("删除对象失败[%s]%s", bucket, errors[:10])
+            raise TypeError(f"delete failed {len(errors)}/{count}")
+        return count
+
+    async def startup(self):
+        """启动S3客户端."""
+        await self.client.startup()
+
+    async def shutdown(self):
+        """关闭S3客户端."""
+        await self.client.shutdown()
+
     def create_s3_json(self, s3_key: str):
         """构建S3JSON对象."""
         assert s3_key.startswith("s3://")
@@ -7,6 +7,7 @@
 @desc: s3接口
 """
 
+import asyncio
 from hashlib import md5
 from typing import Optional
 
@@ -18,6 +19,15 @@ from .base import S3BizClient
 from .base import S3Client
 
 
+def file_md5(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """流式计算文件md5."""
+    hash_ = md5()
+    with open(file_path, "rb") as fs:
+        for chunk in iter(lambda: fs.read(chunk_size), b""):
+            hash_.update(chunk)
+    return hash_.hexdigest()
+
+
 class S3CacheClient(S3BizClient):
     """临时文件搬运库."""
 
@@ -58,11 +68,15 @@ class S3CacheClient(S3BizClient):
 
     def create_s3_object_by_hash(self, suffix: str, data: bytes):
         """根据文件id创建路径."""
+        hashs = md5(data).hexdigest()
+        return self.create_s3_object_by_hash_code(suffix, hashs)
+
+    def create_s3_object_by_hash_code(self, suffix: str, hash_code: str):
+        """根据文件哈希创建路径."""
         if suffix.startswith("."):
             suffix = suffix[1:]
 
-        hashs = md5(data).hexdigest()
-        hash_code = str(hashs).replace("-", "")
+        hash_code = str(hash_code).replace("-", "")
         s3_key = self.__make_s3_key(hash_code, suffix)
         obj = self.s3cli.create_s3_object(s3_key)
         return obj
@@ -98,12 +112,16 @@ class S3CacheClient(S3BizClient):
 
         suffix = content_type.extension
         content_type = content_type.mime
-        obj = self.create_s3_object_by_hash(suffix, data)
+
+        # 流式计算全文件哈希, 避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        hash_code = await loop.run_in_executor(None, file_md5, file_path)
+        obj = self.create_s3_object_by_hash_code(suffix, hash_code)
 
         # 检查是否下载过
         is_exist = await obj.is_exist_s3()
         if not froce and is_exist:
             return obj
 
-        await obj.put_s3_block(file_path)
+        await obj.put_s3_block(file_path, content_type=content_type)
         return obj
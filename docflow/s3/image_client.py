@@ -8,7 +8,11 @@
 """
 from hashlib import md5
 from typing import Optional
+from typing import Union
 
+from PIL import Image
+
+from ..utils.images import ImageData
 from .base import PutDataImage
 from .base import S3BizClient
 from .base import S3Client
@@ -28,7 +32,9 @@ class S3ObjectPathImagePage(S3ObjectPathImage):
         page_name = f"{page:03d}.png"
         return super().create_image_s3(page_name)
 
-    def create_putdata_image_page_s3(self, page: int, data: bytes) -> PutDataImage:
+    def create_putdata_image_page_s3(
+        self, page: int, data: Union[bytes, Image.Image, ImageData]
+    ) -> PutDataImage:
         """转换图片缓存."""
         page_name = f"{page:03d}.png"
         return super().create_putdata_image_s3(page_name, data)
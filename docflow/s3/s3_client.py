@@ -7,6 +7,8 @@
 @desc: s3接口
 """
 
+from typing import Any
+from typing import Callable
 from typing import Optional
 from urllib.parse import urlparse
 
@@ -45,6 +47,14 @@ class S3Client(object):
         self.s3cli = s3cli
         self.bucket = bucket
 
+    async def startup(self):
+        """启动S3客户端."""
+        await self.s3cli.startup()
+
+    async def shutdown(self):
+        """关闭S3客户端."""
+        await self.s3cli.shutdown()
+
     async def init_bucket(self):
         """初始化桶信息."""
         await self.s3cli.create_bucket_when_not_exists(self.bucket)
@@ -66,26 +76,16 @@ class S3Client(object):
             },
         )
 
-    async def clear_bucket(self):
-        """清理桶数据."""
-        async with self.s3cli.client.client() as s3cli:
-            objs = await s3cli.list_objects_v2(Bucket=self.bucket)
-            if not objs.get("Contents", []):
-                return
-
-            response = await s3cli.delete_objects(
-                Bucket=self.bucket,
-                Delete={
-                    "Objects": [
-                        {
-                            "Key": i["Key"],
-                        }
-                        for i in objs["Contents"]
-                    ],
-                    "Quiet": True,
-                },
-            )
-            return response
+    async def clear_bucket(
+        self,
+        dry_run: bool = False,
+        concurrency: Optional[int] = None,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> int:
+        """清理桶数据, 返回删除(dry_run时为待删除)对象数量."""
+        return await self.s3cli.delete_prefix(
+            self.bucket, "", dry_run, concurrency, progress
+        )
 
     @classmethod
     def from_config(
@@ -93,6 +93,8 @@ class S3Client(object):
         url,
         presign_expire: Optional[int] = None,
         bucket_name: Optional[str] = None,
+        max_connections: int = 10,
+        put_concurrency: Optional[int] = None,
     ):
         """创建客户端，构造函数."""
         url_ = urlparse(url)
@@ -101,12 +103,20 @@ class S3Client(object):
                 f"{url_.scheme}://{url_.hostname}:{url_.port}",
                 url_.username,
                 url_.password,
+                max_pool_connections=max_connections,
             )
         else:
             cli = S3Session(
-                f"{url_.scheme}://{url_.hostname}", url_.username, url_.password
+                f"{url_.scheme}://{url_.hostname}",
+                url_.username,
+                url_.password,
+                max_pool_connections=max_connections,
             )
-        return cls(S3ClientBase(cli), presign_expire, bucket_name)
+        return cls(
+            S3ClientBase(cli, put_concurrency=put_concurrency),
+            presign_expire,
+            bucket_name,
+        )
 
 
 class S3ScpClient(object):
@@ -126,6 +136,14 @@ class S3ScpClient(object):
         self.s3cli = s3cli
         self.bucket = bucket
 
+    async def startup(self):
+        """启动S3客户端."""
+        await self.s3cli.startup()
+
+    async def shutdown(self):
+        """关闭S3客户端."""
+        await self.s3cli.shutdown()
+
     async def init_bucket(self):
         """初始化桶信息."""
         await self.s3cli.create_bucket_when_not_exists(self.bucket)
@@ -136,6 +154,8 @@ class S3ScpClient(object):
         url,
         presign_expire: Optional[int] = None,
         bucket_name: Optional[str] = None,
+        max_connections: int = 10,
+        put_concurrency: Optional[int] = None,
     ):
         """创建客户端，构造函数."""
         url_ = urlparse(url)
@@ -144,9 +164,17 @@ class S3ScpClient(object):
                 f"{url_.scheme}://{url_.hostname}:{url_.port}",
                 url_.username,
                 url_.password,
+                max_pool_connections=max_connections,
             )
         else:
             cli = S3Session(
-                f"{url_.scheme}://{url_.hostname}", url_.username, url_.password
+                f"{url_.scheme}://{url_.hostname}",
+                url_.username,
+                url_.password,
+                max_pool_connections=max_connections,
             )
-        return cls(S3ClientBase(cli), presign_expire, bucket_name)
+        return cls(
+            S3ClientBase(cli, put_concurrency=put_concurrency),
+            presign_expire,
+            bucket_name,
+        )
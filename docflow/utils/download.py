@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-19 14:08:51.
+
+@author: ppolxda
+
+@desc: 长连接下载会话
+"""
+
+import asyncio
+import time
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import AsyncContextManager
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from botocore.exceptions import ClientError
+
+from .loops import LoopSession
+
+
+@dataclass
+class DownloadMetrics(object):
+    """下载统计."""
+
+    requests: int = 0
+    errors: int = 0
+    size: int = 0
+    total_time: float = 0.0
+
+
+class DownloadSession(object):
+    """进程级下载会话.
+
+    http(s) 使用长连接 aiohttp 会话, 每个事件循环各自复用连接池并限制单个主机连接数,
+    s3:// 直接通过 get_object 流式读取, 不再签名后二次下载
+
+    s3_client: 返回S3客户端上下文的函数
+    error: 下载失败时抛出的异常, 默认 TypeError("rsp error")
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        pool_size: int,
+        pool_per_host: int,
+        s3_client: Callable[[], AsyncContextManager],
+        error: Optional[BaseException] = None,
+    ):
+        """初始化函数."""
+        self.pool_size = pool_size
+        self.pool_per_host = pool_per_host
+        self.s3_client = s3_client
+        self.error = error
+        self.sessions = LoopSession(self.create_session)
+        self.metrics: Dict[str, DownloadMetrics] = {}
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """创建长连接会话."""
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.pool_size, limit_per_host=self.pool_per_host
+            )
+        )
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的长连接会话."""
+        return self.sessions.get()
+
+    async def close(self):
+        """关闭当前事件循环的会话."""
+        await self.sessions.close()
+
+    def download_error(self) -> BaseException:
+        """下载失败异常."""
+        return TypeError("rsp error") if self.error is None else self.error
+
+    def record(self, host: str, size: int, cost: float, failed: bool = False):
+        """记录下载统计."""
+        metrics = self.metrics.setdefault(host, DownloadMetrics())
+        metrics.requests += 1
+        metrics.size += size
+        metrics.total_time += cost
+        if failed:
+            metrics.errors += 1
+
+    def stats(self) -> Dict[str, dict]:
+        """按主机汇总的下载统计."""
+        return {key: asdict(val) for key, val in self.metrics.items()}
+
+    async def get(self, url: str, timeout: int) -> bytes:
+        """下载 http(s) 文件."""
+        host = urlparse(url).netloc
+        start = time.perf_counter()
+        data = b""
+        try:
+            session = self.get_session()
+            ttt = aiohttp.ClientTimeout(total=timeout)  # type: ignore
+            async with session.get(url, timeout=ttt) as rrr:
+                data = await rrr.read()
+        except Exception:
+            self.record(host, len(data), time.perf_counter() - start, True)
+            raise
+        self.record(host, len(data), time.perf_counter() - start)
+
+        if b"NoSuchKey" in data or b"<Error>" in data:
+            raise self.download_error()
+        return data
+
+    async def read_s3(self, bucket: str, object_id: str, buffer: bytearray):
+        """分块读取S3对象."""
+        async with self.s3_client() as s3cli:
+            rrr = await s3cli.get_object(Bucket=bucket, Key=object_id)
+            async with rrr["Body"] as stream:
+                while True:
+                    chunk = await stream.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    buffer.extend(chunk)
+
+    async def get_s3(self, url: str, timeout: int) -> bytes:
+        """直接读取 s3:// 文件."""
+        s3_ = urlparse(url)
+        bucket = s3_.netloc
+        object_id = s3_.path
+        if object_id.startswith("/"):
+            object_id = object_id[1:]
+
+        start = time.perf_counter()
+        buffer = bytearray()
+        try:
+            await asyncio.wait_for(self.read_s3(bucket, object_id, buffer), timeout)
+        except ClientError as ex:
+            self.record("s3", len(buffer), time.perf_counter() - start, True)
+            raise self.download_error() from ex
+        except Exception:
+            self.record("s3", len(buffer), time.perf_counter() - start, True)
+            raise
+        self.record("s3", len(buffer), time.perf_counter() - start)
+        return bytes(buffer)
@@ -10,25 +10,37 @@ import math
 import numbers
 import os
 import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
 from decimal import ROUND_HALF_UP
 from decimal import Decimal
 from functools import partial
 from inspect import signature
 from io import BytesIO
+from itertools import islice
 from pathlib import Path
 from typing import Awaitable
 from typing import Callable
+from typing import Deque
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import TypeVar
 from typing import Union
 
 import filetype
+import fitz
 import ghostscript
 from fastapi import APIRouter
 from fastapi import FastAPI
 from PIL import Image
 
+from ..settings import settings
+
 RT = TypeVar("RT")
 
 
@@ -162,8 +174,148 @@ def pdf2png_with_ghostscript(
     return images
 
 
-def iter_page_image(pdf_buf: bytes, resolution: int = 150, thread_count=4):
-    """PDF转图片.
+def open_pdf(pdf_data: Union[bytes, str]) -> fitz.Document:
+    """打开PDF文档, 支持二进制数据和文件路径."""
+    if isinstance(pdf_data, bytes):
+        return fitz.open(stream=pdf_data, filetype="pdf")
+    return fitz.open(pdf_data)
+
+
+def pdf_page_range(
+    page_count: int, first_page: Optional[int] = None, last_page: Optional[int] = None
+) -> range:
+    """页码范围(从1开始, 包含 last_page), 返回从0开始的页索引."""
+    if not first_page or first_page < 1:
+        first_page = 1
+
+    if not last_page or last_page > page_count:
+        last_page = page_count
+
+    return range(first_page - 1, last_page)
+
+
+def render_pdf_page(page: fitz.Page, resolution: int = 150) -> Image.Image:
+    """渲染单页为RGB图片."""
+    pix = page.get_pixmap(dpi=resolution, alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def iter_pdf_pages(
+    pdf_data: Union[bytes, str],
+    resolution: int = 150,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+) -> Iterator[Image.Image]:
+    """逐页渲染PDF, 每次只保留一页图片.
+
+    first_page, last_page: 页码范围, 从1开始, 默认全部页
+    """
+    with open_pdf(pdf_data) as doc:
+        for i in pdf_page_range(doc.page_count, first_page, last_page):
+            yield render_pdf_page(doc[i], resolution)
+
+
+# 渲染子进程内缓存的PDF文档, 由 init_render_worker 打开
+_render_doc: Optional[fitz.Document] = None
+
+
+def init_render_worker(pdf_data: Union[bytes, str]):
+    """渲染子进程初始化, 每个进程只加载一次PDF."""
+    global _render_doc
+    _render_doc = open_pdf(pdf_data)
+
+
+def render_worker_page(index: int, resolution: int) -> Tuple[int, Image.Image]:
+    """渲染子进程内渲染单页."""
+    assert _render_doc is not None
+    return index, render_pdf_page(_render_doc[index], resolution)
+
+
+def iter_pdf_pages_parallel(
+    pdf_data: Union[bytes, str],
+    resolution: int = 150,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    workers: int = 4,
+    ordered: bool = True,
+    window: Optional[int] = None,
+) -> Iterator[Tuple[int, Image.Image]]:
+    """多进程逐页渲染PDF, 返回 (页码, 图片), 页码从1开始.
+
+    每个子进程初始化时加载一次PDF, 按页提交渲染任务,
+    最多 window 页同时渲染或等待消费(默认 workers * 2), 控制内存占用
+    ordered: True 按页码顺序返回, False 按完成顺序返回
+    """
+    with open_pdf(pdf_data) as doc:
+        pages = pdf_page_range(doc.page_count, first_page, last_page)
+
+    if window is None:
+        window = workers * 2
+
+    window = max(window, 1)
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_render_worker,
+        initargs=(pdf_data,),
+    )
+    try:
+        pages_ = iter(pages)
+        if ordered:
+            queue: Deque[Future] = deque()
+            for i in islice(pages_, window):
+                queue.append(executor.submit(render_worker_page, i, resolution))
+
+            while queue:
+                index, image = queue.popleft().result()
+                for i in islice(pages_, 1):
+                    queue.append(executor.submit(render_worker_page, i, resolution))
+                yield index + 1, image
+        else:
+            pending = {
+                executor.submit(render_worker_page, i, resolution)
+                for i in islice(pages_, window)
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, image = future.result()
+                    for i in islice(pages_, 1):
+                        pending.add(executor.submit(render_worker_page, i, resolution))
+                    yield index + 1, image
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def default_render_workers(
+    pdf_buf: bytes,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+) -> int:
+    """默认渲染进程数.
+
+    默认在当前进程渲染, settings.PDF2IMAGE_PARALLEL_MIN_PAGES 大于0且页数达到该值时
+    使用 settings.PDF2IMAGE_THRED_COUNT 个进程
+    """
+    min_pages = settings.PDF2IMAGE_PARALLEL_MIN_PAGES
+    if min_pages <= 0 or settings.PDF2IMAGE_THRED_COUNT <= 1:
+        return 1
+
+    with open_pdf(pdf_buf) as doc:
+        pages = pdf_page_range(doc.page_count, first_page, last_page)
+
+    return settings.PDF2IMAGE_THRED_COUNT if len(pages) >= min_pages else 1
+
+
+def iter_page_image(
+    pdf_buf: bytes,
+    resolution: int = 150,
+    thread_count: Optional[int] = None,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+) -> Iterator[Image.Image]:
+    """PDF转图片, 逐页返回.
+
+    thread_count: 渲染进程数, 大于1时多进程渲染, 默认见 default_render_workers
 
     公式 https://pixelcalculator.com/en
 
@@ -174,12 +326,22 @@ def iter_page_image(pdf_buf: bytes, resolution: int = 150, thread_count=4):
     A4 = 210 × 297 mm
     A4 210 mm = 595.2 px
     """
-    assert thread_count
-    imgs = pdf2png_with_ghostscript(pdf_buf, resolution)
-    return imgs
+    if thread_count is None:
+        thread_count = default_render_workers(pdf_buf, first_page, last_page)
 
+    if thread_count <= 1:
+        yield from iter_pdf_pages(pdf_buf, resolution, first_page, last_page)
+        return
 
-def pdf2image(pdf_buf: bytes, resolution: int = 150, thread_count=4):
+    for _, image in iter_pdf_pages_parallel(
+        pdf_buf, resolution, first_page, last_page, workers=thread_count
+    ):
+        yield image
+
+
+def pdf2image(
+    pdf_buf: bytes, resolution: int = 150, thread_count: Optional[int] = None
+):
     """PDF转图片.
 
     公式 https://pixelcalculator.com/en
@@ -191,16 +353,17 @@ def pdf2image(pdf_buf: bytes, resolution: int = 150, thread_count=4):
     A4 = 210 × 297 mm
     A4 210 mm = 595.2 px
     """
-    assert thread_count
-    imgs = pdf2png_with_ghostscript(pdf_buf, resolution)
-    return imgs
+    return list(iter_page_image(pdf_buf, resolution, thread_count))
 
 
 def page2image(pdf_buf: bytes, page=0, resolution: int = 100, thread_count=4):
-    """指定页码PDF转图片."""
+    """指定页码PDF转图片, 页码从1开始, 0 表示第一页."""
     assert thread_count
-    imgs = pdf2png_with_ghostscript(pdf_buf, resolution, page=page)
-    return imgs[0]  # type: ignore
+    page = max(page, 1)
+    with open_pdf(pdf_buf) as doc:
+        if page > doc.page_count:
+            raise IndexError("page out of range")
+        return render_pdf_page(doc[page - 1], resolution)
 
 
 def _decimalize(v, q=None):
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-18 15:20:41.
+
+@author: ppolxda
+
+@desc: 图片数据容器
+"""
+
+from io import BytesIO
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from PIL import Image
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+# PNG可直接保存的模式, 其他模式(CMYK等)编码前先转换
+PNG_MODES = ("1", "L", "LA", "I", "I;16", "P", "RGB", "RGBA")
+
+
+class ImageData(object):
+    """图片数据.
+
+    同时持有原始编码数据和延迟解码的PIL图片, 上传时直接复用原始PNG数据,
+    每个对象最多解码一次、编码一次; 图片保持原始模式, 模型推理使用 rgb
+    """
+
+    def __init__(
+        self, data: Optional[bytes] = None, image: Optional[Image.Image] = None
+    ):
+        """初始化函数."""
+        if data is None and image is None:
+            raise TypeError("image invaild")
+
+        self._data = data
+        self._image = image
+        self._rgb: Optional[Image.Image] = None
+        self._png: Optional[bytes] = data if self.is_png else None
+        self._size: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    def from_any(
+        cls, image: Union[bytes, BytesIO, Image.Image, "ImageData"]
+    ) -> "ImageData":
+        """构建图片数据."""
+        if isinstance(image, ImageData):
+            return image
+        elif isinstance(image, Image.Image):
+            return cls(image=image)
+        elif isinstance(image, BytesIO):
+            return cls(data=image.getvalue())
+        elif isinstance(image, bytes):
+            return cls(data=image)
+        else:
+            raise TypeError("image invaild")
+
+    @property
+    def data(self) -> bytes:
+        """原始编码数据, 只有PIL图片时编码为PNG."""
+        if self._data is None:
+            self._data = self.to_png()
+        return self._data
+
+    @property
+    def is_png(self) -> bool:
+        """原始数据是否为PNG."""
+        return self._data is not None and self._data.startswith(PNG_SIGNATURE)
+
+    @property
+    def is_jpeg(self) -> bool:
+        """原始数据是否为JPEG."""
+        return self._data is not None and self._data.startswith(JPEG_SIGNATURE)
+
+    @property
+    def image(self) -> Image.Image:
+        """PIL图片, 首次访问时解码."""
+        if self._image is None:
+            assert self._data is not None
+            image = Image.open(BytesIO(self._data))
+            image.load()
+            self._image = image
+        return self._image
+
+    @property
+    def rgb(self) -> Image.Image:
+        """RGB图片, 首次访问时转换."""
+        if self._rgb is None:
+            image = self.image
+            self._rgb = image if image.mode == "RGB" else image.convert("RGB")
+        return self._rgb
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """图片宽高, 未解码时只读取文件头."""
+        if self._image is not None:
+            return self._image.size
+
+        if self._size is None:
+            assert self._data is not None
+            with Image.open(BytesIO(self._data)) as image:
+                self._size = image.size
+        return self._size
+
+    @property
+    def width(self) -> int:
+        """图片宽度."""
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        """图片高度."""
+        return self.size[1]
+
+    def to_png(self) -> bytes:
+        """PNG编码数据, 原始数据为PNG时直接返回."""
+        if self._png is None:
+            image = self.image
+            if image.mode not in PNG_MODES:
+                image = image.convert("RGBA" if "A" in image.mode else "RGB")
+
+            ccc = BytesIO()
+            image.save(ccc, "png")
+            self._png = ccc.getvalue()
+        return self._png
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-19 09:12:36.
+
+@author: ppolxda
+
+@desc: 事件循环绑定状态
+"""
+
+import asyncio
+import contextlib
+import logging
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import AsyncContextManager
+from typing import Callable
+from typing import Dict
+from typing import Generic
+from typing import Optional
+from typing import TypeVar
+
+import aiohttp
+
+LOGGER = logging.getLogger()
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """按事件循环保存的状态.
+
+    aiohttp会话、信号量、客户端等对象绑定创建时的事件循环, 每个事件循环各自持有一份,
+    切换事件循环时不会替换仍在使用中的旧状态; 事件循环关闭后在下次访问时释放
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        release: Optional[Callable[[T], None]] = None,
+    ):
+        """初始化函数."""
+        self.factory = factory
+        self.release = release
+        self.values: Dict[asyncio.AbstractEventLoop, T] = {}
+
+    def get(self) -> T:
+        """获取当前事件循环的状态, 不存在时创建."""
+        loop = asyncio.get_running_loop()
+        self.prune()
+        value = self.values.get(loop)
+        if value is None:
+            value = self.values[loop] = self.factory()
+        return value
+
+    def pop(self) -> Optional[T]:
+        """移除当前事件循环的状态."""
+        return self.values.pop(asyncio.get_running_loop(), None)
+
+    def prune(self):
+        """释放已关闭事件循环的状态."""
+        for loop in [i for i in self.values if i.is_closed()]:
+            value = self.values.pop(loop)
+            if self.release is None:
+                continue
+
+            try:
+                self.release(value)
+            except Exception as ex:  # pylint: disable=broad-except
+                LOGGER.debug("释放事件循环状态失败[%s]", ex)
+
+
+def release_session(session: aiohttp.ClientSession):
+    """释放已关闭事件循环上的aiohttp会话.
+
+    事件循环已关闭无法 await close(), 分离连接器后同步关闭连接
+    (新版本aiohttp的 connector.close 为协程, 统一调用同步的 _close)
+    """
+    if session.closed:
+        return
+
+    connector = session.connector
+    session.detach()
+    if connector is not None:
+        connector._close()  # pylint: disable=protected-access
+
+
+def release_s3_client(client):
+    """释放已关闭事件循环上的aiobotocore客户端.
+
+    客户端的连接池为内部的aiohttp会话, 按 release_session 同步关闭
+    """
+    endpoint = getattr(client, "_endpoint", None)
+    http_session = getattr(endpoint, "http_session", None)
+    session = getattr(http_session, "_session", None)
+    if isinstance(session, aiohttp.ClientSession):
+        release_session(session)
+
+
+class LoopSession(object):
+    """按事件循环保存的长连接aiohttp会话.
+
+    factory 创建会话及其连接池, 会话被关闭后下次获取时重新创建
+    """
+
+    def __init__(self, factory: Callable[[], aiohttp.ClientSession]):
+        """初始化函数."""
+        self.sessions: LoopLocal[aiohttp.ClientSession] = LoopLocal(
+            factory, release_session
+        )
+
+    def get(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的长连接会话."""
+        session = self.sessions.get()
+        if session.closed:
+            self.sessions.pop()
+            session = self.sessions.get()
+        return session
+
+    async def close(self):
+        """关闭当前事件循环的会话."""
+        session = self.sessions.pop()
+        if session is not None and not session.closed:
+            await session.close()
+
+
+@dataclass
+class ClientState(object):
+    """事件循环内的长连接客户端."""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    exit_stack: Optional[contextlib.AsyncExitStack] = None
+    client: Any = None
+
+
+class LoopClient(Generic[T]):
+    """按事件循环保存的长连接异步客户端.
+
+    factory 返回客户端的异步上下文, 每个事件循环首次使用时进入并保持,
+    close 在当前事件循环退出上下文; 事件循环关闭后无法 await, 由 release 同步释放
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], AsyncContextManager[T]],
+        release: Optional[Callable[[T], None]] = None,
+    ):
+        """初始化函数."""
+        self.factory = factory
+        self.release = release
+        self.states: LoopLocal[ClientState] = LoopLocal(
+            ClientState, self.release_state
+        )
+
+    async def get(self) -> T:
+        """获取当前事件循环的客户端, 不存在时创建."""
+        state = self.states.get()
+        if state.client is None:
+            async with state.lock:
+                if state.client is None:
+                    exit_stack = contextlib.AsyncExitStack()
+                    state.client = await exit_stack.enter_async_context(
+                        self.factory()
+                    )
+                    state.exit_stack = exit_stack
+        return state.client
+
+    async def close(self):
+        """关闭当前事件循环的客户端."""
+        state = self.states.pop()
+        if state is not None and state.exit_stack is not None:
+            await state.exit_stack.aclose()
+
+    def release_state(self, state: ClientState):
+        """释放已关闭事件循环的客户端."""
+        if state.client is not None and self.release is not None:
+            self.release(state.client)
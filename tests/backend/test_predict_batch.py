@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-19 15:36:02.
+
+@author: ppolxda
+
+@desc: 动态批处理测试
+"""
+
+import asyncio
+import pickle
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+# pylint: disable=wrong-import-position
+from docflow.backend.predict_batch import DynamicBatcher  # noqa: E402
+
+
+class FakeForward(object):
+    """记录批次大小, 返回每个窗口的 input_ids 作为 logits."""
+
+    def __init__(self, error: bool = False):
+        """初始化函数."""
+        self.error = error
+        self.sizes = []
+
+    def __call__(self, inputs):
+        """推理."""
+        size = int(inputs["input_ids"].shape[0])
+        self.sizes.append(size)
+        if self.error:
+            raise RuntimeError("forward failed")
+        return inputs["input_ids"].float() * 10
+
+
+def make_inputs(value: int, windows: int = 1):
+    """构建请求, 每个窗口的值为 value."""
+    return {
+        "input_ids": torch.full((windows, 2), value, dtype=torch.long),
+        "attention_mask": torch.ones((windows, 2), dtype=torch.long),
+    }
+
+
+async def test_batch_scatter():
+    """并发请求合并推理, 结果按请求拆分."""
+    forward = FakeForward()
+    batcher = DynamicBatcher(forward, max_batch_size=4, max_wait=0.05)
+    windows = [1, 2, 1, 3]
+    results = await asyncio.gather(
+        *[batcher.predict(make_inputs(i, n)) for i, n in enumerate(windows)]
+    )
+
+    assert all(size <= 4 for size in forward.sizes)
+    assert sum(forward.sizes) == sum(windows)
+    assert len(forward.sizes) < len(windows)
+    for i, (logits, count) in enumerate(zip(results, windows)):
+        assert logits.shape == (count, 2)
+        assert torch.equal(logits, torch.full((count, 2), i * 10.0))
+
+
+async def test_batch_oversize_request():
+    """单个请求超出批次大小时独占一个批次."""
+    forward = FakeForward()
+    batcher = DynamicBatcher(forward, max_batch_size=2, max_wait=0.05)
+    big, small = await asyncio.gather(
+        batcher.predict(make_inputs(1, 5)), batcher.predict(make_inputs(2))
+    )
+    assert sorted(forward.sizes) == [1, 5]
+    assert big.shape[0] == 5 and small.shape[0] == 1
+
+
+async def test_batch_error():
+    """推理失败时批次内所有请求抛出异常, 调度协程继续运行."""
+    forward = FakeForward(error=True)
+    batcher = DynamicBatcher(forward, max_batch_size=4, max_wait=0.05)
+    results = await asyncio.gather(
+        batcher.predict(make_inputs(1)),
+        batcher.predict(make_inputs(2)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(i, RuntimeError) for i in results)
+
+    forward.error = False
+    logits = await batcher.predict(make_inputs(3))
+    assert torch.equal(logits, torch.full((1, 2), 30.0))
+
+
+def test_batch_per_loop():
+    """不同事件循环各自调度, 不影响其他事件循环已入队的请求."""
+    forward = FakeForward()
+    batcher = DynamicBatcher(forward, max_batch_size=4, max_wait=0.2)
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        # 其他事件循环的请求先入队等待合批
+        other = asyncio.run_coroutine_threadsafe(
+            batcher.predict(make_inputs(1)), other_loop
+        )
+        logits = asyncio.run(batcher.predict(make_inputs(2)))
+        assert torch.equal(logits, torch.full((1, 2), 20.0))
+        assert torch.equal(other.result(5), torch.full((1, 2), 10.0))
+        asyncio.run_coroutine_threadsafe(batcher.close(), other_loop).result(5)
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(5)
+        other_loop.close()
+
+
+async def test_batch_pickle():
+    """序列化后重新创建事件循环状态."""
+    batcher = DynamicBatcher(FakeForward(), max_batch_size=4)
+    await batcher.predict(make_inputs(1))
+    batcher = pickle.loads(pickle.dumps(batcher))
+    logits = await batcher.predict(make_inputs(2))
+    assert torch.equal(logits, torch.full((1, 2), 20.0))
+
+
+async def test_batch_close():
+    """关闭后取消未完成的请求, 再次提交时重新启动调度."""
+    batcher = DynamicBatcher(FakeForward(), max_batch_size=4, max_wait=10)
+    waiting = asyncio.ensure_future(batcher.predict(make_inputs(1)))
+    await asyncio.sleep(0.05)
+    await batcher.close()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    batcher.max_wait = 0.01
+    logits = await batcher.predict(make_inputs(2))
+    assert torch.equal(logits, torch.full((1, 2), 20.0))
+    await batcher.close()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+@create: 2026-10-19 10:21:44.
+
+@author: ppolxda
+
+@desc: 推理后端一致性测试
+"""
+
+import io
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+
+# pylint: disable=wrong-import-position
+from docflow.backend.predict_engine import QUANTIZE_SKIP_MODULES  # noqa: E402
+from docflow.backend.predict_engine import OnnxModel  # noqa: E402
+from docflow.backend.predict_engine import example_inputs  # noqa: E402
+from docflow.backend.predict_engine import load_pretrained_model  # noqa: E402
+from docflow.backend.predict_engine import warmup_predictor  # noqa: E402
+
+TINY = {
+    "hidden_size": 32,
+    "num_hidden_layers": 2,
+    "num_attention_heads": 2,
+    "intermediate_size": 37,
+}
+# LayoutLMv3 位置编码拼接后需等于 hidden_size: 4 * coordinate + 2 * shape,
+# 位置编码从 padding_idx + 1 开始, 与 layoutlmv3-base 一致使用 514
+TINY_LAYOUT = dict(TINY, coordinate_size=4, shape_size=8, max_position_embeddings=514)
+
+# 与三个预测器使用的模型结构一致, 随机初始化的小模型
+PREDICTORS = {
+    # Layoutlmv3Predict
+    "keyinfo": (
+        transformers.AutoModelForTokenClassification,
+        transformers.LayoutLMv3Config(num_labels=7, **TINY_LAYOUT),
+    ),
+    # Layoutlmv3ClassificationPredict
+    "pdfclass": (
+        transformers.AutoModelForSequenceClassification,
+        transformers.LayoutLMv3Config(num_labels=5, **TINY_LAYOUT),
+    ),
+    # Layoutlmv3ClassificationBertPredict
+    "pdfclass_bert": (
+        transformers.AutoModelForSequenceClassification,
+        transformers.BertConfig(num_labels=5, **TINY),
+    ),
+}
+
+
+def random_inputs(model, batch: int):
+    """随机输入, 形状与预测时一致."""
+    inputs = {}
+    for key, val in example_inputs(model).items():
+        shape = (batch,) + tuple(val.shape[1:])
+        if key == "input_ids":
+            inputs[key] = torch.randint(5, model.config.vocab_size, shape)
+        elif key == "bbox":
+            box = torch.randint(0, 500, shape).sort(-1).values
+            inputs[key] = box[..., [0, 2, 1, 3]]
+        elif key == "pixel_values":
+            inputs[key] = torch.rand(shape)
+        else:
+            inputs[key] = torch.ones(shape, dtype=val.dtype)
+    return inputs
+
+
+@pytest.fixture(params=list(PREDICTORS))
+def checkpoint(request, tmp_path):
+    """保存随机初始化的checkpoint."""
+    auto_cls, config = PREDICTORS[request.param]
+    torch.manual_seed(0)
+    auto_cls.from_config(config).save_pretrained(tmp_path)
+    return auto_cls, str(tmp_path)
+
+
+def test_onnx_export_on_load(checkpoint):
+    """加载onnx后端时导出并缓存模型."""
+    auto_cls, model_path = checkpoint
+    model = load_pretrained_model(auto_cls, model_path, backend="onnxruntime")
+    assert isinstance(model, OnnxModel)
+    assert model.session is not None
+    assert os.path.isfile(os.path.join(model_path, OnnxModel.ONNX_NAME))
+
+
+@pytest.mark.parametrize("batch", [1, 3])
+def test_onnx_parity(checkpoint, batch):
+    """onnxruntime 与 torch 推理结果一致."""
+    auto_cls, model_path = checkpoint
+    torch_model = load_pretrained_model(
+        auto_cls, model_path, backend="torch", quantize=False
+    ).eval()
+    onnx_model = load_pretrained_model(auto_cls, model_path, backend="onnxruntime")
+
+    torch.manual_seed(batch)
+    inputs = random_inputs(torch_model, batch)
+    with torch.inference_mode():
+        expected = torch_model(**inputs).logits
+
+    actual = onnx_model(**inputs).logits
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=1e-4, rtol=1e-3)
+    assert torch.equal(actual.argmax(-1), expected.argmax(-1))
+
+
+def state_dict_size(model) -> int:
+    """序列化后的权重大小."""
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+@pytest.mark.skipif(
+    "fbgemm" not in torch.backends.quantized.supported_engines
+    and "qnnpack" not in torch.backends.quantized.supported_engines,
+    reason="quantized engine unavailable",
+)
+def test_quantize_parity(checkpoint):
+    """动态INT8量化替换Linear层, 推理结果与fp32接近."""
+    auto_cls, model_path = checkpoint
+    fp32_model = load_pretrained_model(
+        auto_cls, model_path, backend="torch", quantize=False
+    ).eval()
+    int8_model = load_pretrained_model(
+        auto_cls, model_path, backend="torch", quantize=True
+    )
+
+    dynamic_linear = torch.ao.nn.quantized.dynamic.Linear
+    linears = {
+        name
+        for name, module in fp32_model.named_modules()
+        if isinstance(module, torch.nn.Linear)
+    }
+    quantized = {
+        name
+        for name, module in int8_model.named_modules()
+        if isinstance(module, dynamic_linear)
+    }
+    skipped = {i for i in linears if i.rsplit(".", 1)[-1] in QUANTIZE_SKIP_MODULES}
+    assert quantized and quantized == linears - skipped
+    assert state_dict_size(int8_model) < state_dict_size(fp32_model)
+
+    torch.manual_seed(3)
+    inputs = random_inputs(fp32_model, 3)
+    with torch.inference_mode():
+        expected = fp32_model(**inputs).logits
+        actual = int8_model(**inputs).logits
+
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=5e-2)
+    agree = (actual.argmax(-1) == expected.argmax(-1)).float().mean().item()
+    assert agree >= 0.95
+
+
+class FakePredictor(object):
+    """预热测试对象."""
+
+    def __init__(self, error: bool):
+        """初始化函数."""
+        self.error = error
+
+    def warmup(self):
+        """预热."""
+        if self.error:
+            raise RuntimeError("load failed")
+
+
+def test_warmup_predictor():
+    """预热失败时不可就绪."""
+    assert warmup_predictor(FakePredictor(False))
+    assert not warmup_predictor(FakePredictor(True))
+    assert warmup_predictor(object())